@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Content-addressed on-disk cache in front of pwntools' asm().
+
+pwnlib.asm.asm() writes temp files and runs the binutils assembler and
+linker on every call.  asm() here keys the result on a hash of the source,
+the pwntools context it is assembled for (arch, os, endian and any other
+context keyword given), pwnlib.asm.asm()'s own options (vma, shared) and
+the toolchain (pwntools version and the assembler and linker binaries), so
+a repeat costs a file read, or a dict lookup within the same process, and
+does not import pwntools at all.  extract=False, which returns the path of
+an ELF file, is passed straight through.
+
+Entries are written to a temp file and renamed into place, so concurrent
+writers never expose a partial entry, and a hit bumps the entry's mtime.
+When a write takes the cache over its size bound the least recently used
+entries are removed.  The solve scripts and bench tools share one cache,
+by default ~/.cache/arm-assembly/asm ($XDG_CACHE_HOME is honoured,
+$ASM_CACHE_DIR overrides it).
+
+    from asmcache import asm
+    code = asm("mov x1, #0x1337")
+
+    python asmcache.py            # entries and size
+    python asmcache.py --clear
+"""
+
+import argparse
+import functools
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+
+from typing import Optional
+
+DEFAULT_CONTEXT = {"arch": "aarch64", "os": "linux", "endian": "little"}
+
+# pwnlib.asm.asm()'s own keyword arguments and their defaults; every other
+# keyword is a context attribute
+ASM_OPTIONS = {"vma": 0, "extract": True, "shared": False}
+
+
+def default_directory() -> pathlib.Path:
+    if "ASM_CACHE_DIR" in os.environ:
+        return pathlib.Path(os.environ["ASM_CACHE_DIR"])
+    base = os.environ.get("XDG_CACHE_HOME") or pathlib.Path.home() / ".cache"
+    return pathlib.Path(base) / "arm-assembly" / "asm"
+
+
+@functools.lru_cache(maxsize=None)
+def toolchain(arch: str) -> tuple:
+    """pwntools' version and the identity of the binutils it would run for `arch`."""
+    from importlib import metadata
+
+    try:
+        version = metadata.version("pwntools")
+    except metadata.PackageNotFoundError:
+        version = None
+    tools = []
+    for tool in ("as", "ld"):
+        for prefix in (f"{arch}-linux-gnu-", f"{arch}-linux-", f"{arch}-elf-", f"{arch}-"):
+            path = shutil.which(prefix + tool)
+            if path is not None:
+                st = os.stat(path)
+                tools.append((path, st.st_size, st.st_mtime_ns))
+                break
+    return version, tuple(tools)
+
+
+def current_context(overrides: dict) -> dict:
+    """DEFAULT_CONTEXT, then pwntools' global context if it is loaded, then `overrides`."""
+    context = dict(DEFAULT_CONTEXT)
+    if "pwnlib.context" in sys.modules:
+        pwn_context = sys.modules["pwnlib.context"].context
+        context.update({name: getattr(pwn_context, name) for name in DEFAULT_CONTEXT})
+    context.update(overrides)
+    return context
+
+
+class AsmCache:
+    """
+    A directory of assembled code, one file per key under a two-character
+    fan-out, bounded to max_bytes by least-recently-used eviction.
+    """
+
+    MAX_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, directory: Optional[pathlib.Path] = None, max_bytes: int = MAX_BYTES):
+        self.directory = pathlib.Path(directory) if directory is not None else default_directory()
+        self.max_bytes = max_bytes
+        self.memory = {}
+
+    def key(self, source: str, context: dict, options: dict) -> str:
+        blob = json.dumps([source, sorted(context.items()), sorted(options.items()), toolchain(context["arch"])])
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    def path(self, key: str) -> pathlib.Path:
+        return self.directory / key[:2] / f"{key}.bin"
+
+    def get(self, key: str) -> Optional[bytes]:
+        if key in self.memory:
+            return self.memory[key]
+        path = self.path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            # missing, or evicted by another process since
+            return None
+        self.memory[key] = data
+        return data
+
+    def put(self, key: str, data: bytes):
+        self.memory[key] = data
+        path = self.path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as fp:
+                fp.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            # a read-only or full cache directory only costs the speed-up
+            return
+        self.evict()
+
+    def entries(self) -> list:
+        """(mtime, size, path) of every entry."""
+        found = []
+        for path in self.directory.glob("*/*.bin"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            found.append((st.st_mtime_ns, st.st_size, path))
+        return found
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        # trim to 90% so the next few writes do not each rescan
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes * 9 // 10:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        self.memory.clear()
+
+    def asm(self, source: str, **kwargs) -> bytes:
+        options = {name: kwargs.pop(name, default) for name, default in ASM_OPTIONS.items()}
+        context = current_context(kwargs)
+        if not options["extract"]:
+            return self.assemble(source, context, options)
+        key = self.key(source, context, options)
+        data = self.get(key)
+        if data is None:
+            data = self.assemble(source, context, options)
+            self.put(key, data)
+        return data
+
+    def assemble(self, source: str, context: dict, options: dict):
+        import pwnlib.asm
+        import pwnlib.context
+
+        with pwnlib.context.context.local(**context):
+            return pwnlib.asm.asm(source, **options)
+
+
+_cache = None
+
+
+def asm(source: str, **kwargs) -> bytes:
+    """Drop-in for pwntools' asm(source, **kwargs), through the shared cache."""
+    global _cache
+    if _cache is None:
+        _cache = AsmCache()
+    return _cache.asm(source, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", type=pathlib.Path, help="cache directory (default: %(default)s)", default=default_directory())
+    parser.add_argument("--clear", action="store_true", help="remove every entry")
+    args = parser.parse_args()
+
+    cache = AsmCache(args.dir)
+    if args.clear:
+        cache.clear()
+    entries = cache.entries()
+    print(f"{cache.directory}: {len(entries)} entries, {sum(size for _, size, _ in entries)} bytes")
+
+
+if __name__ == "__main__":
+    main()
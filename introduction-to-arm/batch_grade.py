@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Offline batch grader for stored submissions.
+
+Submissions are graded in-process by the LEVELS classes from run.py, spread
+over a pool of forked workers.  .config is not read and privileges are not
+touched; each item names its own level.  Results are streamed to JSONL in
+completion order, one object per submission:
+
+    {"id": ..., "level": N, "won": bool, "reason": ..., "emu_err": ..., "budget_err": ...,
+     "profile": ..., "tiers": [...], "seconds": ...}
+
+profile is run.py's ExecutionProfile summary of a passing submission
+(instructions, loads, stores, taken branches, estimated cycles), else null,
+and tiers the level's performance tiers with whether each was reached.
+
+Input is either a directory laid out like this repo,
+
+    DIR/level1/<any name>      raw AArch64 bytes for level 1
+    DIR/level15/<any name>     ...
+
+or a JSONL manifest of {"id": ..., "level": N, "path": ...} objects, with
+paths relative to the manifest.
+
+    python batch_grade.py submissions/ -o results.jsonl
+    python batch_grade.py --manifest regrade.jsonl -j 16 --keep-output
+"""
+
+import argparse
+import json
+import multiprocessing
+import pathlib
+import re
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+
+import run
+
+
+def scan_directory(root: pathlib.Path):
+    for level_dir in sorted(root.iterdir()):
+        match = re.fullmatch(r"level(\d+)", level_dir.name)
+        if not match or not level_dir.is_dir():
+            continue
+        for path in sorted(level_dir.iterdir()):
+            if path.is_file():
+                yield {"id": str(path.relative_to(root)), "level": int(match.group(1)), "path": str(path)}
+
+
+def read_manifest(manifest: pathlib.Path):
+    with open(manifest) as fp:
+        for line in fp:
+            if line.strip():
+                item = json.loads(line)
+                item["path"] = str(manifest.parent / item["path"])
+                yield item
+
+
+def grade(job):
+    item, keep_output = job
+    result = {"id": item["id"], "level": item["level"]}
+    start = time.perf_counter()
+    graded = None
+    try:
+        if not 1 <= item["level"] <= len(run.LEVELS):
+            raise ValueError(f"level must be 1-{len(run.LEVELS)}")
+        asm = pathlib.Path(item["path"]).read_bytes()[:0x1000]
+        level = getattr(run, run.LEVELS[item["level"] - 1])(asm=asm)
+        graded = level.grade()
+        result["won"] = graded.won
+        result["reason"] = graded.reason
+        result["emu_err"] = level.emu_err
+        result["budget_err"] = level.budget_err
+        result["profile"] = graded.profile
+        result["tiers"] = graded.tiers
+    except Exception as e:
+        result["won"] = False
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - start
+    if keep_output:
+        result["output"] = graded.render() if graded is not None else ""
+    return result
+
+
+def init_worker():
+    # the batch pool already uses every core
+    run.EmbryoARMBase.TRIAL_WORKERS = 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", nargs="?", type=pathlib.Path)
+    parser.add_argument("--manifest", type=pathlib.Path)
+    parser.add_argument("-o", "--output", type=pathlib.Path, help="JSONL results (default: stdout)")
+    parser.add_argument("-j", "--jobs", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--keep-output", action="store_true", help="include each grading transcript")
+    parser.add_argument("--max-tasks-per-worker", type=int, default=1000)
+    args = parser.parse_args()
+
+    if (args.directory is None) == (args.manifest is None):
+        parser.error("give exactly one of DIRECTORY or --manifest")
+    items = list(scan_directory(args.directory) if args.directory else read_manifest(args.manifest))
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    passed = 0
+    start = time.perf_counter()
+    ctx = multiprocessing.get_context("fork")
+    with ctx.Pool(args.jobs, initializer=init_worker, maxtasksperchild=args.max_tasks_per_worker) as pool:
+        jobs = ((item, args.keep_output) for item in items)
+        for done, result in enumerate(pool.imap_unordered(grade, jobs), 1):
+            passed += result["won"]
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            if done % 100 == 0:
+                elapsed = time.perf_counter() - start
+                print(f"{done}/{len(items)} graded, {done / elapsed:.1f}/s", file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    if out is not sys.stdout:
+        out.close()
+    print(
+        f"{len(items)} submissions, {passed} passed, {elapsed:.2f}s, "
+        f"{len(items) / elapsed if elapsed else 0:.1f} submissions/s with {args.jobs} workers",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Compare one-process-per-submission grading against the run.py fork server.
+
+run.py is copied into a scratch directory next to a .config for the chosen
+level, then the same submission is graded N times both ways:
+
+    cold   `python run.py` with the submission on stdin
+    fork   one `python run.py --fork-server SOCK`, one connection per submission
+
+Latency is end-to-end as seen by the client.  Throughput is measured with
+--clients concurrent submitters.
+
+    python bench/forkserver.py --level 1 -n 200 --clients 8
+    python bench/forkserver.py --level 15 --submission fib.bin -n 20
+"""
+
+import argparse
+import os
+import pathlib
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(HERE))
+
+import run
+
+
+def cold_submit(workdir: pathlib.Path, submission: bytes) -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, str(workdir / "run.py")],
+        input=submission,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def fork_submit(sock_path: str, submission: bytes) -> float:
+    start = time.perf_counter()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(sock_path)
+        conn.sendall(submission)
+        conn.shutdown(socket.SHUT_WR)
+        while conn.recv(65536):
+            pass
+    return time.perf_counter() - start
+
+
+def measure(name, submit, count: int, clients: int):
+    latencies = [submit() for _ in range(count)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        list(pool.map(lambda _: submit(), range(count)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "mode": name,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "throughput": count / elapsed,
+    }
+
+
+def wait_for_socket(path: str, server: subprocess.Popen):
+    while server.poll() is None:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                probe.connect(path)
+                probe.shutdown(socket.SHUT_WR)
+                while probe.recv(65536):
+                    pass
+            return
+        except (FileNotFoundError, ConnectionRefusedError):
+            time.sleep(0.01)
+    raise RuntimeError("fork server exited during start-up")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--level", type=int, default=1)
+    parser.add_argument("--submission", type=pathlib.Path, help="raw AArch64 bytes (default: level 1 answer)")
+    parser.add_argument("-n", "--count", type=int, default=100)
+    parser.add_argument("--clients", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    if args.submission:
+        submission = args.submission.read_bytes()
+    else:
+        submission = run.A64Template().mov(1, 0x1337).assemble()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = pathlib.Path(tmp)
+        shutil.copy(HERE / "run.py", workdir / "run.py")
+        (workdir / ".config").write_text(str(args.level))
+        sock_path = str(workdir / "grader.sock")
+
+        results = [measure("cold", lambda: cold_submit(workdir, submission), args.count, args.clients)]
+
+        server = subprocess.Popen(
+            [sys.executable, str(workdir / "run.py"), "--fork-server", sock_path],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_for_socket(sock_path, server)
+            results.append(measure("fork", lambda: fork_submit(sock_path, submission), args.count, args.clients))
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"level {args.level}, {args.count} submissions, {args.clients} concurrent clients")
+    print(f"{'mode':<6}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'subs/s':>10}")
+    for r in results:
+        print(f"{r['mode']:<6}{r['mean_ms']:>10.2f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['throughput']:>10.1f}")
+    cold, fork = results
+    print(f"speedup: latency x{cold['mean_ms'] / fork['mean_ms']:.1f}, throughput x{fork['throughput'] / cold['throughput']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
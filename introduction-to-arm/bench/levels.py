@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Grader benchmark driven by the reference solutions in levelN/solve.py.
+
+Each solution's assembly is lifted out of its solve.py, assembled through
+asmcache (pwntools on a miss), and fed straight into the matching LEVELS
+class (no /challenge/run process).  For every level the median over
+--repeat runs is reported for:
+
+    construct   level __init__ (random inputs, oracle)
+    create_emu  emulator creation, mapping and code load
+    harness     building and loading the call harness (Avg, Fib)
+    emulate     time spent inside emulate()
+    check       rest of trace(): input seeding, restores, checker
+    trace       the whole trace() call
+
+plus the cost of importing run.py in a fresh interpreter.
+
+    python bench/levels.py --output baseline.json
+    python bench/levels.py --compare baseline.json 1 2 3
+"""
+
+import argparse
+import json
+import pathlib
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(HERE))
+
+import run
+
+PHASES = ("construct", "create_emu", "harness", "emulate", "check", "trace")
+
+
+def solution_source(level: int) -> str:
+    src = (HERE / f"level{level}" / "solve.py").read_text()
+    return re.search(r'asm\("""(.*?)"""\)', src, re.S).group(1)
+
+
+def assemble(source: str) -> bytes:
+    from asmcache import asm
+
+    return asm(source, arch="aarch64")
+
+
+def measure_import() -> float:
+    code = f"import sys, time; sys.path.insert(0, {str(HERE)!r}); t = time.perf_counter(); import run; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return float(out) * 1000
+
+
+def grade_once(cls, asm: bytes):
+    timings = dict.fromkeys(PHASES, 0.0)
+
+    start = time.perf_counter()
+    level = cls(asm=asm)
+    timings["construct"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    level.create_emu()
+    timings["create_emu"] = time.perf_counter() - start
+
+    def timed(name, fn):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timings[name] += time.perf_counter() - start
+        return wrapper
+
+    level.emulate = timed("emulate", level.emulate)
+    level.load_harness = timed("harness", level.load_harness)
+    if hasattr(level, "build_harness"):
+        level.build_harness = timed("harness", level.build_harness)
+
+    start = time.perf_counter()
+    won = level.trace().won
+    timings["trace"] = time.perf_counter() - start
+    timings["check"] = timings["trace"] - timings["emulate"] - timings["harness"]
+
+    return won, {name: value * 1000 for name, value in timings.items()}
+
+
+def bench_level(level: int, repeat: int):
+    cls = getattr(run, run.LEVELS[level - 1])
+    asm = assemble(solution_source(level))
+
+    runs = [grade_once(cls, asm) for _ in range(repeat)]
+    return {
+        "level": level,
+        "name": cls.__name__,
+        "passed": all(won for won, _ in runs),
+        "ms": {name: statistics.median(t[name] for _, t in runs) for name in PHASES},
+    }
+
+
+def print_table(results, baseline=None):
+    width = 18 if baseline else 12
+    print(f"{'level':<6}{'name':<38}{'ok':<4}" + "".join(f"{p:>{width}}" for p in PHASES))
+    for r in results:
+        cells = []
+        for phase in PHASES:
+            cell = f"{r['ms'][phase]:.3f}"
+            if baseline and r["level"] in baseline and baseline[r["level"]]["ms"][phase] > 0:
+                cell += f" {r['ms'][phase] / baseline[r['level']]['ms'][phase]:.2f}x"
+            cells.append(f"{cell:>{width}}")
+        print(f"{r['level']:<6}{r['name']:<38}{'ok' if r['passed'] else 'NO':<4}" + "".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("levels", nargs="*", type=int)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument("--output", type=pathlib.Path, help="write results as JSON")
+    parser.add_argument("--compare", type=pathlib.Path, help="JSON from an earlier --output to compare against")
+    args = parser.parse_args()
+
+    levels = args.levels or range(1, len(run.LEVELS) + 1)
+    report = {
+        "python": sys.version.split()[0],
+        "import_ms": measure_import(),
+        "levels": [bench_level(level, args.repeat) for level in levels],
+    }
+
+    baseline = None
+    if args.compare:
+        old = json.loads(args.compare.read_text())
+        baseline = {r["level"]: r for r in old["levels"]}
+        print(f"import run.py: {report['import_ms']:.1f} ms (baseline {old['import_ms']:.1f} ms)")
+    else:
+        print(f"import run.py: {report['import_ms']:.1f} ms")
+    print_table(report["levels"], baseline)
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+    if not all(r["passed"] for r in report["levels"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Deadline-rush load test for grade_server.py.
+
+Submissions arrive open-loop at --rate per second (Poisson) from --users
+simulated users, each tagged with its user so the server (started with
+--trust-tags) queues them per user.  --heavy is the share of submissions
+sent by user 0, to see that one user's flood does not delay the others.
+Each submission is a random one of the levels' reference solutions (see
+bench/levels.py), or of the files under --submissions, laid out like
+batch_grade.py's input directory.
+
+Reported: responses by status, client-side latency percentiles for user 0
+and for everyone else, throughput, and the server's own stats at the end.
+With --spawn N the server is started here with N workers and stopped
+afterwards; otherwise one must already listen on SOCKET.
+
+    python bench/load.py grader.sock --spawn 4 -n 500 --rate 50
+    python bench/load.py /run/grader.sock --users 200 --heavy 0.5 --levels 1 5 11
+    python bench/load.py grader.sock --spawn 2 --submissions submissions/ --server-args "--per-user 2"
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import pathlib
+import random
+import shlex
+import subprocess
+import sys
+import time
+
+HERE = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(HERE))
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+
+import run
+
+from grade_server import REQUEST, RESPONSE, percentiles
+
+# Fib's reference takes seconds per grading; ask for it with --levels
+DEFAULT_LEVELS = [n for n in range(1, len(run.LEVELS) + 1) if run.LEVELS[n - 1] != "EmbryoARMFib"]
+
+
+def reference_submissions(levels) -> list:
+    from levels import assemble, solution_source
+
+    return [(level, assemble(solution_source(level))) for level in levels]
+
+
+def stored_submissions(root: pathlib.Path, levels) -> list:
+    from batch_grade import scan_directory
+
+    return [
+        (item["level"], pathlib.Path(item["path"]).read_bytes()[:0x1000])
+        for item in scan_directory(root)
+        if item["level"] in levels
+    ]
+
+
+async def request(path: str, level: int, tag: bytes, code: bytes) -> dict:
+    reader, writer = await asyncio.open_unix_connection(path)
+    try:
+        writer.write(REQUEST.pack(level, len(tag), len(code)) + tag + code)
+        await writer.drain()
+        size, = RESPONSE.unpack(await reader.readexactly(RESPONSE.size))
+        return json.loads(await reader.readexactly(size))
+    finally:
+        writer.close()
+
+
+async def submit(path: str, user: int, level: int, code: bytes, results: list):
+    start = time.perf_counter()
+    try:
+        response = await request(path, level, f"user{user}".encode(), code)
+    except (OSError, asyncio.IncompleteReadError) as e:
+        response = {"status": "failed", "reason": str(e)}
+    results.append((user, response, (time.perf_counter() - start) * 1000))
+
+
+async def generate(args, submissions: list) -> tuple:
+    rng = random.Random(args.seed)
+    results = []
+    tasks = []
+    start = time.perf_counter()
+    for _ in range(args.count):
+        user = 0 if rng.random() < args.heavy else rng.randrange(1, args.users)
+        level, code = rng.choice(submissions)
+        tasks.append(asyncio.create_task(submit(args.socket, user, level, code, results)))
+        await asyncio.sleep(rng.expovariate(args.rate))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    stats = await request(args.socket, 0, b"", b"")
+    return results, elapsed, stats
+
+
+def wait_for_socket(path: str, server: subprocess.Popen):
+    async def probe():
+        await request(path, 0, b"", b"")
+
+    while server.poll() is None:
+        try:
+            asyncio.run(probe())
+            return
+        except (FileNotFoundError, ConnectionRefusedError):
+            time.sleep(0.05)
+    raise RuntimeError("grade server exited during start-up")
+
+
+def report(results: list, elapsed: float, stats: dict):
+    statuses = collections.Counter(response["status"] for _, response, _ in results)
+    graded = [(user, ms) for user, response, ms in results if response["status"] == "graded"]
+    won = sum(bool(response.get("won")) for _, response, _ in results)
+    print(f"{len(results)} submissions in {elapsed:.1f}s: " + ", ".join(f"{n} {s}" for s, n in statuses.most_common()))
+    print(f"{len(graded)} graded ({won} passed), {len(graded) / elapsed:.1f} graded/s")
+    print(f"{'latency ms':<14}{'n':>6}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+    for name, picked in (("user 0", [ms for user, ms in graded if user == 0]),
+                         ("other users", [ms for user, ms in graded if user != 0])):
+        p = percentiles(picked)
+        if p:
+            print(f"{name:<14}{len(picked):>6}" + "".join(f"{p[k]:>10.1f}" for k in ("p50", "p90", "p99", "max")))
+    print("server:", json.dumps(stats))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("socket")
+    parser.add_argument("-n", "--count", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=20.0, help="submissions per second (default: %(default)s)")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--heavy", type=float, default=0.0, help="share of submissions from user 0")
+    parser.add_argument("--levels", nargs="+", type=int, default=DEFAULT_LEVELS)
+    parser.add_argument("--submissions", type=pathlib.Path, help="directory of stored submissions")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--spawn", type=int, metavar="WORKERS", help="start grade_server.py with this many workers")
+    parser.add_argument("--server-args", default="", help="more grade_server.py arguments for --spawn")
+    args = parser.parse_args()
+
+    if args.users < 2:
+        parser.error("--users must be at least 2")
+    if args.submissions:
+        submissions = stored_submissions(args.submissions, args.levels)
+    else:
+        submissions = reference_submissions(args.levels)
+    if not submissions:
+        parser.error("no submissions for those levels")
+
+    server = None
+    if args.spawn:
+        server = subprocess.Popen(
+            [sys.executable, str(HERE / "grade_server.py"), args.socket, "--workers", str(args.spawn),
+             "--trust-tags", "--stats-interval", "0", *shlex.split(args.server_args)],
+            stdout=subprocess.DEVNULL,
+        )
+    try:
+        if server is not None:
+            wait_for_socket(args.socket, server)
+        report(*asyncio.run(generate(args, submissions)))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
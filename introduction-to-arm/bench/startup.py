@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Start-up cost of the grader, per level.
+
+Each level is started in a fresh `python -X importtime` process that imports
+run.py, builds the level with a one-instruction submission, creates the
+emulator and runs it (without the disassembly listing).  The interpreter's
+import timings are grouped by top-level package, so a new eager import or a
+slow module shows up in the column it belongs to.
+
+    python bench/startup.py
+    python bench/startup.py --json > startup.json
+    python bench/startup.py --max-ms 400    # non-zero exit on regression
+"""
+
+import argparse
+import json
+import pathlib
+import subprocess
+import sys
+import time
+
+HERE = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(HERE))
+
+PACKAGES = ("unicorn", "capstone", "numpy", "pwnlib", "run")
+
+CHILD = """
+import sys, time
+sys.path.insert(0, {here!r})
+start = time.perf_counter()
+import run
+imported = time.perf_counter()
+level = getattr(run, run.LEVELS[{level} - 1])(asm=run.A64Template().mov(0, 0).assemble())
+level.create_emu()
+level.trace()
+done = time.perf_counter()
+print((imported - start) * 1000, (done - imported) * 1000, "pwnlib" in sys.modules, "capstone" in sys.modules)
+"""
+
+
+def parse_importtime(stderr: str):
+    """Cumulative import time (ms) of each package, wherever it was first imported."""
+    per_package = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        per_package.setdefault(name.strip(), int(cumulative_us) / 1000)
+    return per_package
+
+
+def measure(level: int):
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD.format(here=str(HERE), level=level)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall = (time.perf_counter() - start) * 1000
+    import_ms, level_ms, pwnlib_loaded, capstone_loaded = proc.stdout.split()
+    packages = parse_importtime(proc.stderr)
+    return {
+        "level": level,
+        "wall_ms": wall,
+        "import_run_ms": float(import_ms),
+        "level_ms": float(level_ms),
+        "imports_ms": {name: packages.get(name, 0.0) for name in PACKAGES},
+        "pwnlib_loaded": pwnlib_loaded == "True",
+        "capstone_loaded": capstone_loaded == "True",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("levels", nargs="*", type=int)
+    parser.add_argument("--json", action="store_true", help="emit one JSON object per level")
+    parser.add_argument("--max-ms", type=float, help="fail if any level's wall time exceeds this")
+    args = parser.parse_args()
+
+    import run
+    levels = args.levels or range(1, len(run.LEVELS) + 1)
+    results = [measure(level) for level in levels]
+
+    if args.json:
+        for r in results:
+            print(json.dumps(r))
+    else:
+        print(f"{'level':<6}{'wall':>8}{'run.py':>8}{'trace':>8}" + "".join(f"{p:>10}" for p in PACKAGES) + "  pwnlib")
+        for r in results:
+            print(
+                f"{r['level']:<6}{r['wall_ms']:>8.1f}{r['import_run_ms']:>8.1f}{r['level_ms']:>8.1f}"
+                + "".join(f"{r['imports_ms'][p]:>10.1f}" for p in PACKAGES)
+                + f"  {'yes' if r['pwnlib_loaded'] else 'no'}"
+            )
+
+    if args.max_ms is not None:
+        slow = [r["level"] for r in results if r["wall_ms"] > args.max_ms]
+        if slow:
+            print(f"start-up over {args.max_ms} ms for levels {slow}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Differential fuzzer for a submission against a level's reference solution.
+
+The submission and the reference (levelN/solve.py's solution, assembled
+through asmcache, or --reference) each get one emulator, set up for the
+level's spec once and restored from a snapshot before every run.  Both run
+on the same inputs, drawn from the level's fuzz_fields(): first every
+combination of edge values (bounds, 0 and 1, 2**k - 1 and 2**k at the usual
+widths), then random draws with edges mixed in.  Fuzzing stops at the first
+input where
+
+    divergence      the two end with a different error or final state
+    checker         the reference itself does not match the level's expected
+                    output, i.e. the level's checker and its reference
+                    disagree
+
+and the input is shrunk field by field while it still fails the same way.
+--wide draws from the full 64-bit range instead of the level's own input
+contract (which is where checker disagreements hide).
+
+Runs are bounded by INSN_BUDGET instructions only; unicorn's timeout
+starts a watchdog thread per emu_start, which costs more than a whole run
+of most submissions.
+
+    python fuzz.py 5 submission.bin
+    python fuzz.py 11 submission.bin --wide --seconds 300 --output repro.json
+    python fuzz.py 6 submission.bin --reference other.bin -n 1000000 --seed 7
+"""
+
+import argparse
+import copy
+import itertools
+import json
+import pathlib
+import random
+import sys
+import time
+
+HERE = pathlib.Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+sys.path.insert(0, str(HERE / "bench"))
+
+import run
+
+from unicorn import UcError
+from unicorn.arm64_const import UC_ARM64_REG_PC
+
+PROGRESS_EVERY = 100_000
+
+
+class Runner:
+    """One piece of code on its own emulator, set up for `spec` and restored before every run."""
+
+    def __init__(self, level: run.EmbryoARMBase, spec: run.LevelSpec):
+        self.level = level
+        level.create_emu()
+        level.install(spec)
+        level.snapshot()
+        self.begin, self.until = level.code_range
+
+    def run(self, spec: run.LevelSpec) -> tuple:
+        """(error, expected, actual, matched) for one run of `spec`."""
+        level = self.level
+        level.restore()
+        level.visited = []
+        level.emu_stopped = False
+        # inputs move the guarded words (an array's end key), so guard this spec's
+        level.install_guards(spec)
+        error = None
+        try:
+            level.seed(spec)
+            if level.guards is not None:
+                level.guards.arm()
+            level.emu.emu_start(self.begin, self.until, count=level.INSN_BUDGET)
+        except UcError as e:
+            error = str(e)
+        if level.guards is not None and level.emu_err is None:
+            level.check_guards(spec)
+        if level.emu_err is not None:
+            error = level.emu_err
+        elif error is None and not level.emu_stopped and level.emu.reg_read(UC_ARM64_REG_PC) != self.until:
+            error = f"did not finish within {level.INSN_BUDGET} instructions"
+
+        regs = level.regs.read()
+        words = {}
+        for where in spec.expect:
+            if isinstance(where, run.Mem):
+                try:
+                    words[where] = int.from_bytes(level.read_mem(where.locate(regs), 8), "little")
+                except UcError:
+                    words[where] = None
+        matched, expected, actual = spec.compare(regs, words, level.visited)
+        return error, expected, actual, error is None and matched
+
+
+class Fuzzer:
+    def __init__(self, cls, submission: bytes, reference: bytes, wide: bool):
+        proto = cls(asm=submission)
+        self.proto = proto
+        self.fields = [field.widen() if wide else field for field in proto.fuzz_fields()]
+        spec = proto.spec()
+        # the reference shares the submission's level attributes (addresses, keys)
+        other = copy.copy(proto)
+        other.asm = reference
+        self.submission = Runner(proto, spec)
+        self.reference = Runner(other, spec)
+        self.executions = 0
+
+    def check(self, values: dict) -> tuple:
+        """(kind of failure or None, submission outcome, reference outcome) for one input."""
+        spec = self.proto.input_spec(values)
+        sub = self.submission.run(spec)
+        ref = self.reference.run(spec)
+        self.executions += 1
+        if not ref[3]:
+            return "checker", sub, ref
+        if (sub[0], sub[2]) != (ref[0], ref[2]):
+            return "divergence", sub, ref
+        return None, sub, ref
+
+    def inputs(self, rng: random.Random):
+        for combo in itertools.product(*(field.edges() for field in self.fields)):
+            yield {field.name: value for field, value in zip(self.fields, combo)}
+        edges = [field.edges() for field in self.fields]
+        while True:
+            yield {
+                field.name: rng.choice(edge) if edge and rng.random() < 0.25 else field.draw(rng)
+                for field, edge in zip(self.fields, edges)
+            }
+
+    def minimize(self, values: dict, kind: str) -> dict:
+        """Shrink one field at a time while the input still fails as `kind`, restarting after every step."""
+        progress = True
+        while progress:
+            progress = False
+            for field in self.fields:
+                for candidate in field.shrink(values[field.name]):
+                    smaller = {**values, field.name: candidate}
+                    if self.check(smaller)[0] == kind:
+                        values = smaller
+                        progress = True
+                        break
+                if progress:
+                    break
+        return values
+
+
+def reference_code(level: int) -> bytes:
+    from levels import assemble, solution_source
+
+    return assemble(solution_source(level))
+
+
+def hexed(value):
+    if isinstance(value, list):
+        return [hexed(v) for v in value]
+    if isinstance(value, dict):
+        return {k: hexed(v) for k, v in value.items()}
+    return hex(value) if isinstance(value, int) and not isinstance(value, bool) else value
+
+
+def describe(outcome: tuple) -> dict:
+    error, _, actual, matched = outcome
+    return {"error": error, "actual": hexed(actual), "matched": matched}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("level", type=int)
+    parser.add_argument("submission", type=pathlib.Path, help="raw AArch64 bytes")
+    parser.add_argument("--reference", type=pathlib.Path, help="raw AArch64 bytes (default: levelN/solve.py)")
+    parser.add_argument("-n", "--executions", type=int, help="stop after this many inputs")
+    parser.add_argument("--seconds", type=float, default=60.0, help="stop after this long (default: %(default)s)")
+    parser.add_argument("--seed", type=int, help="random seed (default: random, printed)")
+    parser.add_argument("--wide", action="store_true", help="draw every input from the full 64-bit range")
+    parser.add_argument("--output", type=pathlib.Path, help="write the minimized reproducer as JSON")
+    args = parser.parse_args()
+
+    if not 1 <= args.level <= len(run.LEVELS):
+        parser.error(f"level must be 1-{len(run.LEVELS)}")
+    cls = getattr(run, run.LEVELS[args.level - 1])
+    if getattr(cls, "fuzz_fields", None) is None:
+        parser.error(f"{cls.__name__} does not define fuzz_fields()")
+
+    submission = args.submission.read_bytes()[:0x1000]
+    reference = args.reference.read_bytes()[:0x1000] if args.reference else reference_code(args.level)
+    seed = args.seed if args.seed is not None else random.getrandbits(32)
+    print(f"{cls.__name__}, seed {seed}{', wide' if args.wide else ''}", file=sys.stderr)
+
+    fuzzer = Fuzzer(cls, submission, reference, args.wide)
+    error = fuzzer.proto.spec().length_error(len(submission))
+    if error is not None:
+        print(f"submission is rejected before it runs: {error}", file=sys.stderr)
+        sys.exit(2)
+
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    deadline = start + args.seconds
+    found = None
+    for values in fuzzer.inputs(rng):
+        kind = fuzzer.check(values)[0]
+        if kind is not None:
+            found = values, kind
+            break
+        if fuzzer.executions % PROGRESS_EVERY == 0:
+            elapsed = time.perf_counter() - start
+            print(f"{fuzzer.executions} inputs, {fuzzer.executions / elapsed:.0f}/s", file=sys.stderr)
+        if fuzzer.executions == args.executions or time.perf_counter() >= deadline:
+            break
+
+    elapsed = time.perf_counter() - start
+    count = fuzzer.executions
+    print(f"{count} inputs in {elapsed:.1f}s, {count / elapsed if elapsed else 0:.0f}/s", file=sys.stderr)
+    if found is None:
+        print("no divergence found")
+        return
+
+    values, kind = found
+    values = fuzzer.minimize(values, kind)
+    _, sub, ref = fuzzer.check(values)
+    report = {
+        "level": args.level,
+        "name": cls.__name__,
+        "seed": seed,
+        "wide": args.wide,
+        "kind": kind,
+        "inputs": hexed(values),
+        "expected": hexed(ref[1]),
+        "submission": describe(sub),
+        "reference": describe(ref),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
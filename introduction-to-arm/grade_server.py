@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Submission front end for peak load: one asyncio process on a unix socket
+in front of a fixed pool of forked grading workers.
+
+Instead of one /challenge/run per connection, every submission is read,
+queued and graded in-process by the LEVELS classes from run.py, so the
+number of concurrent gradings is --workers however many students submit
+at once.  The operator files next to run.py (run.OPERATOR_FILES) apply as
+they do for run.py, except .workers; .config does not either, each
+submission names its own level.
+
+A request is one frame,
+
+    u16 level, u16 tag length, u32 code length   (big-endian)
+    tag bytes, then at most 0x1000 bytes of code
+
+answered by a u32 length and a JSON object:
+
+    {"status": "graded", "won": bool, "reason": ..., "output": transcript,
+     "flag": ... (passing only), "profile": ..., "tiers": [...],
+     "wait_ms": ..., "grade_ms": ...}
+    {"status": "busy", "reason": ...}       not admitted, retry later
+    {"status": "error", "reason": ...}      malformed request or grader failure
+
+Level 0 with no tag and no code asks for the server's stats instead.
+
+Submissions are queued per user, the peer's uid (SO_PEERCRED), and
+dispatched round-robin over the users with work, so one user's burst only
+delays that user.  Backpressure:
+
+    --per-user     a user with this many queued is turned away at once
+    --queue        a full queue holds new submissions for --admit-timeout
+                   seconds before turning them away
+    --connections  connections over this are turned away unread
+
+With --trust-tags the frame's tag names the user instead of the uid; that
+is for load tests (bench/load.py), where every simulated user shares one
+uid.  Stats (queue depth, in flight, counts, and p50/p90/p99/max of queue
+wait and of end-to-end latency over the last WINDOW submissions) are
+answered to level 0 requests and written as JSON lines every
+--stats-interval seconds to --stats (default stderr).
+
+    python grade_server.py /run/grader.sock --workers 8
+    python grade_server.py grader.sock -w 4 --queue 64 --per-user 2 --trust-tags
+"""
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import pathlib
+import signal
+import socket
+import struct
+import sys
+import time
+
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+
+import run
+
+REQUEST = struct.Struct(">HHI")
+RESPONSE = struct.Struct(">I")
+MAX_CODE = 0x1000
+MAX_TAG = 256
+
+
+def read_flag() -> Optional[str]:
+    try:
+        with open(run.EmbryoARMBase.FLAG_PATH) as fp:
+            return fp.read()
+    except OSError:
+        return None
+
+
+def grade(level: int, asm: bytes) -> dict:
+    """Grade one submission in a worker; the response fields of a graded submission."""
+    start = time.perf_counter()
+    try:
+        graded = getattr(run, run.LEVELS[level - 1])(asm=asm).grade()
+        result = graded.record()
+        result["output"] = graded.render()
+        if graded.won:
+            result["flag"] = read_flag()
+    except Exception as e:
+        result = {"won": False, "error": f"{type(e).__name__}: {e}"}
+    result["grade_ms"] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def init_worker():
+    # the pool already uses every worker it is given
+    run.EmbryoARMBase.TRIAL_WORKERS = 1
+    warm = run.EmbryoARMSetRegister(asm=run.A64Template().mov(0, 0).assemble())
+    warm.create_emu()
+    warm.emu.emu_start(warm.BASE_ADDR, warm.BASE_ADDR + 4)
+
+
+def percentiles(samples) -> dict:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+    return {
+        "p50": ordered[last * 50 // 100],
+        "p90": ordered[last * 90 // 100],
+        "p99": ordered[last * 99 // 100],
+        "max": ordered[last],
+    }
+
+
+class Busy(Exception):
+    """A submission not admitted to the queue."""
+
+
+class Submission:
+    def __init__(self, user: str, level: int, asm: bytes):
+        self.user = user
+        self.level = level
+        self.asm = asm
+        self.arrived = time.monotonic()
+        self.dispatched = None
+        self.done = asyncio.get_running_loop().create_future()
+
+
+class FairQueue:
+    """
+    Bounded queue of Submissions with one FIFO per user, taken from the
+    users round-robin.
+    """
+
+    def __init__(self, maxsize: int, per_user: int):
+        self.maxsize = maxsize
+        self.per_user = per_user
+        self.queues = {}
+        # users with queued submissions, in the order they are served
+        self.turns = collections.deque()
+        self.size = 0
+        self.changed = asyncio.Condition()
+
+    def queued(self, user: str) -> int:
+        return len(self.queues.get(user, ()))
+
+    async def put(self, item: Submission, timeout: float):
+        async with self.changed:
+            if self.queued(item.user) >= self.per_user:
+                raise Busy(f"{self.per_user} submissions already queued for this user")
+            try:
+                await asyncio.wait_for(self.changed.wait_for(lambda: self.size < self.maxsize), timeout)
+            except asyncio.TimeoutError:
+                raise Busy(f"queue full ({self.maxsize} submissions)") from None
+            # the user's other connections may have filled their share meanwhile
+            if self.queued(item.user) >= self.per_user:
+                raise Busy(f"{self.per_user} submissions already queued for this user")
+            if item.user not in self.queues:
+                self.queues[item.user] = collections.deque()
+                self.turns.append(item.user)
+            self.queues[item.user].append(item)
+            self.size += 1
+            self.changed.notify_all()
+
+    async def get(self) -> Submission:
+        async with self.changed:
+            await self.changed.wait_for(lambda: self.size > 0)
+            user = self.turns.popleft()
+            pending = self.queues[user]
+            item = pending.popleft()
+            if pending:
+                self.turns.append(user)
+            else:
+                del self.queues[user]
+            self.size -= 1
+            self.changed.notify_all()
+            return item
+
+
+class Stats:
+    # submissions the latency percentiles are taken over
+    WINDOW = 2048
+
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.waits = collections.deque(maxlen=self.WINDOW)
+        self.latencies = collections.deque(maxlen=self.WINDOW)
+        self.started = time.monotonic()
+
+    def finished(self, item: Submission):
+        now = time.monotonic()
+        self.waits.append((item.dispatched - item.arrived) * 1000)
+        self.latencies.append((now - item.arrived) * 1000)
+
+    def snapshot(self, server: "GradeServer") -> dict:
+        return {
+            "status": "stats",
+            "time": time.time(),
+            "uptime": time.monotonic() - self.started,
+            "depth": server.queue.size,
+            "users_queued": len(server.queue.queues),
+            "in_flight": server.in_flight,
+            "connections": server.connections,
+            "workers": server.workers,
+            **self.counts,
+            "wait_ms": percentiles(self.waits),
+            "latency_ms": percentiles(self.latencies),
+        }
+
+
+class GradeServer:
+    def __init__(self, path: str, workers: int, queue: int, per_user: int, admit_timeout: float,
+                 connections: int, read_timeout: float, trust_tags: bool):
+        self.path = path
+        self.workers = workers
+        self.queue_size = queue
+        self.per_user = per_user
+        self.admit_timeout = admit_timeout
+        self.max_connections = connections
+        self.read_timeout = read_timeout
+        self.trust_tags = trust_tags
+        self.pool = None
+        # held while a broken pool is being replaced
+        self.pool_lock = asyncio.Lock()
+        self.queue = None
+        self.stats = Stats()
+        self.in_flight = 0
+        self.connections = 0
+
+    def new_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        pool = concurrent.futures.ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context("fork"), initializer=init_worker,
+        )
+        # fork every worker now, not from inside a request
+        list(pool.map(abs, range(self.workers)))
+        return pool
+
+    def replace_pool(self, broken: concurrent.futures.ProcessPoolExecutor) -> concurrent.futures.ProcessPoolExecutor:
+        # reap the broken pool's remaining workers and its management thread
+        broken.shutdown(wait=False, cancel_futures=True)
+        return self.new_pool()
+
+    async def dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.queue.get()
+            item.dispatched = time.monotonic()
+            self.in_flight += 1
+            pool = self.pool
+            try:
+                result = await loop.run_in_executor(pool, grade, item.level, item.asm)
+                result["status"] = "graded"
+                self.stats.counts["graded"] += 1
+            except BrokenProcessPool:
+                # a worker died (out of memory, a crash in unicorn); its batch is lost
+                async with self.pool_lock:
+                    if pool is self.pool:
+                        # forking the new workers blocks, so not on the event loop
+                        self.pool = await loop.run_in_executor(None, self.replace_pool, pool)
+                result = {"status": "error", "reason": "grader crashed"}
+                self.stats.counts["crashed"] += 1
+            except Exception as e:
+                # grade() reports its own failures, so this is the pool's; the
+                # dispatcher must live on to answer the rest of the queue
+                result = {"status": "error", "reason": f"grader error: {type(e).__name__}: {e}"}
+                self.stats.counts["failed"] += 1
+            finally:
+                self.in_flight -= 1
+            self.stats.finished(item)
+            result["wait_ms"] = (item.dispatched - item.arrived) * 1000
+            # the client may have gone, taking its request task with it
+            if not item.done.done():
+                item.done.set_result(result)
+
+    def user(self, writer: asyncio.StreamWriter, tag: bytes) -> str:
+        if self.trust_tags and tag:
+            return "tag:" + tag.decode(errors="replace")
+        sock = writer.get_extra_info("socket")
+        _, uid, _ = struct.unpack("3i", sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")))
+        return f"uid:{uid}"
+
+    async def request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> dict:
+        header = await asyncio.wait_for(reader.readexactly(REQUEST.size), self.read_timeout)
+        level, tag_size, code_size = REQUEST.unpack(header)
+        if level == 0:
+            return self.stats.snapshot(self)
+        if not 1 <= level <= len(run.LEVELS):
+            return {"status": "error", "reason": f"level must be 1-{len(run.LEVELS)}"}
+        if tag_size > MAX_TAG or code_size > MAX_CODE:
+            return {"status": "error", "reason": f"tag or code too long (at most {MAX_TAG} and {MAX_CODE} bytes)"}
+        body = await asyncio.wait_for(reader.readexactly(tag_size + code_size), self.read_timeout)
+
+        item = Submission(self.user(writer, body[:tag_size]), level, body[tag_size:])
+        try:
+            await self.queue.put(item, self.admit_timeout)
+        except Busy as e:
+            self.stats.counts["rejected"] += 1
+            return {"status": "busy", "reason": str(e)}
+        self.stats.counts["accepted"] += 1
+        return await item.done
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            if self.connections > self.max_connections:
+                self.stats.counts["rejected"] += 1
+                response = {"status": "busy", "reason": f"too many connections ({self.max_connections})"}
+            else:
+                try:
+                    response = await self.request(reader, writer)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    response = {"status": "error", "reason": "incomplete request"}
+            data = json.dumps(response).encode()
+            writer.write(RESPONSE.pack(len(data)) + data)
+            await writer.drain()
+        except ConnectionError:
+            # the client gave up; a graded result is still counted
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def publish(self, interval: float, out):
+        while True:
+            await asyncio.sleep(interval)
+            out.write(json.dumps(self.stats.snapshot(self)) + "\n")
+            out.flush()
+
+    async def serve(self, stats_interval: float, stats_out):
+        self.queue = FairQueue(self.queue_size, self.per_user)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = await asyncio.start_unix_server(self.handle, self.path, backlog=1024)
+        tasks = [asyncio.create_task(self.dispatch()) for _ in range(self.workers)]
+        if stats_interval > 0:
+            tasks.append(asyncio.create_task(self.publish(stats_interval, stats_out)))
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("socket")
+    parser.add_argument("-w", "--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--queue", type=int, default=256, help="queued submissions (default: %(default)s)")
+    parser.add_argument("--per-user", type=int, default=4, help="queued submissions per user (default: %(default)s)")
+    parser.add_argument("--admit-timeout", type=float, default=5.0, help="seconds to wait for room (default: %(default)s)")
+    parser.add_argument("--connections", type=int, default=1024, help="open connections (default: %(default)s)")
+    parser.add_argument("--read-timeout", type=float, default=10.0, help="seconds to send a request (default: %(default)s)")
+    parser.add_argument("--trust-tags", action="store_true", help="take the user from the request's tag (load tests)")
+    parser.add_argument("--stats", type=pathlib.Path, help="append stats JSON lines here (default: stderr)")
+    parser.add_argument("--stats-interval", type=float, default=10.0, help="seconds, 0 for none (default: %(default)s)")
+    args = parser.parse_args()
+
+    run.load_operator_config()
+    run.drop_privileges()
+
+    server = GradeServer(
+        args.socket, args.workers, args.queue, args.per_user, args.admit_timeout,
+        args.connections, args.read_timeout, args.trust_tags,
+    )
+    server.pool = server.new_pool()
+    # shut the workers down on terminate as on ^C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    stats_out = open(args.stats, "a") if args.stats else sys.stderr
+    try:
+        asyncio.run(server.serve(args.stats_interval, stats_out))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.pool.shutdown(cancel_futures=True)
+
+
+if __name__ == "__main__":
+    main()
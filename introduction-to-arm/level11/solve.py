@@ -1,6 +1,10 @@
 from pwn import *
 context.arch = 'aarch64'
 
+import os, sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from asmcache import asm
+
 asm_bytes = asm("""
     ldr x2, [x0], #8
     sub x1, x1, #1
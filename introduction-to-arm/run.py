@@ -1,25 +1,45 @@
 #!/opt/pwn.college/python
 
+import array
+import contextlib
+import ctypes
+import json
+import multiprocessing
 import os
 import pathlib
+import queue
 import random
+import resource
+import signal
+import socket
 import struct
 import sys
-import pwnlib
-import pwnlib.asm
+import time
+import traceback
 
 from typing import List, Optional
 
-from capstone import *
+# Every level emulates, so unicorn is imported eagerly.  capstone is only
+# needed to disassemble and is imported on first use; pwntools is not needed
+# by the grader at all since harnesses are encoded by A64Template.
 from unicorn.arm64_const import *
-from unicorn import *
-
-pwnlib.context.context.update(arch = 'aarch64')
-
-config = (pathlib.Path(__file__).parent / ".config").read_text()
-level = int(config)
-
-os.setuid(os.geteuid())
+from unicorn import (
+    Uc,
+    UcError,
+    UC_ARCH_ARM64,
+    UC_HOOK_BLOCK,
+    UC_HOOK_CODE,
+    UC_HOOK_MEM_WRITE,
+    UC_HOOK_MEM_UNMAPPED,
+    UC_HOOK_MEM_WRITE_PROT,
+    UC_MEM_FETCH_UNMAPPED,
+    UC_MEM_WRITE_UNMAPPED,
+    UC_MODE_ARM,
+    UC_PROT_ALL,
+    UC_PROT_READ,
+    UC_PROT_WRITE,
+    UC_QUERY_TIMEOUT,
+)
 
 LEVELS = [
     # Registers
@@ -47,7 +67,1195 @@ LEVELS = [
     # Functions
     "EmbryoARMAvg",
     "EmbryoARMFib",
+
+    # Large data
+    "EmbryoARMMemoryAccessArrayLarge",
+    "EmbryoARMAvgLarge",
+    ]
+
+PAGE_SIZE = 0x1000
+ZERO_PAGE = bytes(PAGE_SIZE)
+
+# widest single store (stp q, q) that may start below a watched range and
+# reach into it
+WRITE_SLACK = 0x20
+
+_disassembler = None
+
+def get_disassembler():
+    """
+    Process-wide capstone handle, created on first use.
+    """
+    global _disassembler
+    if _disassembler is None:
+        from capstone import Cs, CS_ARCH_ARM64, CS_MODE_ARM
+        _disassembler = Cs(CS_ARCH_ARM64, CS_MODE_ARM)
+    return _disassembler
+
+def a64_movz(rd: int, imm16: int, shift: int = 0) -> int:
+    return 0xD2800000 | (shift // 16) << 21 | (imm16 & 0xFFFF) << 5 | rd
+
+def a64_movk(rd: int, imm16: int, shift: int = 0) -> int:
+    return 0xF2800000 | (shift // 16) << 21 | (imm16 & 0xFFFF) << 5 | rd
+
+def a64_blr(rn: int) -> int:
+    return 0xD63F0000 | rn << 5
+
+def a64_svc(imm16: int) -> int:
+    return 0xD4000001 | (imm16 & 0xFFFF) << 5
+
+def a64_add_imm(rd: int, rn: int, imm12: int) -> int:
+    # register 31 is SP, so this is also mov to and from sp
+    return 0x91000000 | (imm12 & 0xFFF) << 10 | rn << 5 | rd
+
+def a64_sub_imm(rd: int, rn: int, imm12: int) -> int:
+    return 0xD1000000 | (imm12 & 0xFFF) << 10 | rn << 5 | rd
+
+def a64_cbnz(rt: int, offset: int) -> int:
+    return 0xB5000000 | (offset >> 2 & 0x7FFFF) << 5 | rt
+
+def a64_ldr(rt: int, rn: int, offset: int = 0) -> int:
+    return 0xF9400000 | (offset // 8) << 10 | rn << 5 | rt
+
+def a64_str(rt: int, rn: int, offset: int = 0) -> int:
+    return 0xF9000000 | (offset // 8) << 10 | rn << 5 | rt
+
+class A64Template:
+    """
+    Tiny in-process AArch64 code builder for the grader's own harnesses.
+
+    Only the handful of encodings the harnesses need are supported: mov and
+    movk with 16 bit immediates, blr, svc, and the loads, stores, adds and
+    cbnz of tier_call_spec's driver.  Branch offsets are relative to the
+    instruction being emitted.
+    """
+
+    def __init__(self):
+        self.words: List[int] = []
+
+    def mov(self, rd: int, imm16: int):
+        self.words.append(a64_movz(rd, imm16))
+        return self
+
+    def mov_imm64(self, rd: int, value: int):
+        self.words.append(a64_movz(rd, value))
+        for shift in (16, 32, 48):
+            self.words.append(a64_movk(rd, value >> shift, shift))
+        return self
+
+    def blr(self, rn: int):
+        self.words.append(a64_blr(rn))
+        return self
+
+    def svc(self, imm16: int):
+        self.words.append(a64_svc(imm16))
+        return self
+
+    def emit(self, word: int):
+        self.words.append(word)
+        return self
+
+    def assemble(self) -> bytes:
+        return struct.pack(f"<{len(self.words)}I", *self.words)
+
+def reg_name(reg: int) -> str:
+    if UC_ARM64_REG_X0 <= reg <= UC_ARM64_REG_X28:
+        return f"X{reg - UC_ARM64_REG_X0}"
+    return {UC_ARM64_REG_X29: "X29", UC_ARM64_REG_X30: "X30", UC_ARM64_REG_SP: "SP", UC_ARM64_REG_PC: "PC"}.get(reg, str(reg))
+
+class RegisterSnapshot:
+    """Register values taken by RegisterFile.read(), looked up by unicorn register id."""
+
+    __slots__ = ("regs", "index", "values")
+
+    def __init__(self, regs: tuple, index: dict, values: array.array):
+        self.regs = regs
+        self.index = index
+        self.values = values
+
+    def __getitem__(self, reg: int) -> int:
+        return self.values[self.index[reg]]
+
+    def diff(self, after: "RegisterSnapshot") -> List[tuple]:
+        """(reg, before, after) for every register that differs in `after`."""
+        return [(reg, old, new) for reg, old, new in zip(self.regs, self.values, after.values) if old != new]
+
+class RegisterFile:
+    """
+    Batched access to a fixed set of registers, by default X0-X30, SP and PC.
+
+    read() takes every register with one uc_reg_read_batch and write() sets
+    any subset with one uc_reg_write_batch, both through ctypes buffers
+    allocated once.  Uc.reg_read_batch/reg_write_batch do the same but build
+    their ctypes arguments on every call (about 80us for 32 registers, where
+    a single reg_read is about 2us).  Reaching the C library goes through
+    the binding's private handle, so it is probed once and any binding
+    that does not expose it the same way gets the public calls instead:
+    the batch ones where they exist, else one reg_read or reg_write per
+    register.
+    """
+
+    XREGS = tuple(range(UC_ARM64_REG_X0, UC_ARM64_REG_X28 + 1)) + (UC_ARM64_REG_X29, UC_ARM64_REG_X30)
+    REGS = XREGS + (UC_ARM64_REG_SP, UC_ARM64_REG_PC)
+
+    __slots__ = ("uc", "regs", "index", "_batch")
+
+    def __init__(self, uc: Uc, regs: tuple = REGS):
+        self.uc = uc
+        self.regs = regs
+        self.index = {reg: i for i, reg in enumerate(regs)}
+        self._batch = None
+        try:
+            from unicorn.unicorn_py3.unicorn import uclib
+            handle = uc._uch
+            values = (ctypes.c_uint64 * len(regs))()
+            ptrs = (ctypes.c_void_p * len(regs))(*(ctypes.addressof(values) + 8 * i for i in range(len(regs))))
+            ids = (ctypes.c_int * len(regs))(*regs)
+            # the write buffers are filled from the front with whichever registers are written
+            write_ids = (ctypes.c_int * len(regs))()
+            self._batch = (handle, uclib, ids, ptrs, values, write_ids, ctypes.memmove)
+            if self._read_batch()[-1] != uc.reg_read(regs[-1]):
+                raise ValueError("batch read disagrees with reg_read")
+        except Exception:
+            self._batch = None
+
+    def _read_batch(self):
+        handle, uclib, ids, ptrs, values, _, _ = self._batch
+        err = uclib.uc_reg_read_batch(handle, ids, ptrs, len(ids))
+        if err:
+            raise UcError(err)
+        return values
+
+    def _read_public(self) -> array.array:
+        if hasattr(self.uc, "reg_read_batch"):
+            return array.array("Q", self.uc.reg_read_batch(self.regs))
+        return array.array("Q", [self.uc.reg_read(reg) for reg in self.regs])
+
+    def read(self) -> RegisterSnapshot:
+        if self._batch is None:
+            values = self._read_public()
+        else:
+            values = array.array("Q")
+            values.frombytes(bytes(self._read_batch()))
+        return RegisterSnapshot(self.regs, self.index, values)
+
+    def read_into(self, buf: array.array, start: int):
+        """Store every register into buf[start:start + len(regs)] without an intermediate snapshot."""
+        if self._batch is None:
+            buf[start:start + len(self.regs)] = self._read_public()
+            return
+        memmove = self._batch[-1]
+        memmove(buf.buffer_info()[0] + 8 * start, self._read_batch(), 8 * len(self.regs))
+
+    def write(self, values: dict):
+        """Set {reg: value} for any registers of this file."""
+        if self._batch is None:
+            if hasattr(self.uc, "reg_write_batch"):
+                self.uc.reg_write_batch(list(values.items()))
+            else:
+                for reg, value in values.items():
+                    self.uc.reg_write(reg, value)
+            return
+        handle, uclib, _, ptrs, buf, write_ids, _ = self._batch
+        for i, (reg, value) in enumerate(values.items()):
+            write_ids[i] = reg
+            buf[i] = value & 0xFFFFFFFFFFFFFFFF
+        err = uclib.uc_reg_write_batch(handle, write_ids, ptrs, len(values))
+        if err:
+            raise UcError(err)
+
+def format_registers(regs: RegisterSnapshot, entry_regs: Optional[RegisterSnapshot] = None) -> List[str]:
+    lines = [
+        f"PC {hex(regs[UC_ARM64_REG_PC])}",
+        f"SP {hex(regs[UC_ARM64_REG_SP])}",
+        f"LR {hex(regs[UC_ARM64_REG_LR])}",
     ]
+    lines += [f"{reg_name(reg)} {hex(regs[reg])}" for reg in range(UC_ARM64_REG_X0, UC_ARM64_REG_X8 + 1)]
+    if entry_regs is not None:
+        changed = [
+            f"{reg_name(reg)} {hex(old)} -> {hex(new)}"
+            for reg, old, new in entry_regs.diff(regs)
+            if reg != UC_ARM64_REG_PC
+        ]
+        lines.append("Changed during emulation: " + (", ".join(changed) or "nothing"))
+    return lines
+
+class GradeResult:
+    """
+    Outcome of grading one submission, as returned by trace() and run().
+
+    Checking only fills this in; nothing is formatted until render(), so the
+    batch and server graders get the verdict, errors and counters without
+    any text.  inputs, expected and actual map a register name or
+    "[address]" to an int or a list of ints.  regs and entry_regs are the
+    registers at the end and start of the last emulation and are only kept
+    for failures after something was emulated.  profile is the
+    ExecutionProfile summary of a passing submission, when one was taken,
+    and tiers lists each of the level's PerformanceTiers as {"name",
+    "max_insns", "reached"}.  The result is truthy when the submission
+    passed.
+    """
+
+    __slots__ = (
+        "level", "won", "error", "reason", "inputs", "expected", "actual",
+        "regs", "entry_regs", "counters", "profile", "tiers",
+    )
+
+    def __init__(
+        self,
+        level: str,
+        won: bool,
+        error: Optional[str] = None,
+        reason: Optional[str] = None,
+        inputs: Optional[dict] = None,
+        expected: Optional[dict] = None,
+        actual: Optional[dict] = None,
+        regs: Optional[RegisterSnapshot] = None,
+        entry_regs: Optional[RegisterSnapshot] = None,
+    ):
+        self.level = level
+        self.won = won
+        self.error = error
+        self.reason = reason
+        self.inputs = inputs or {}
+        self.expected = expected or {}
+        self.actual = actual or {}
+        self.regs = regs
+        self.entry_regs = entry_regs
+        self.counters = {}
+        self.profile = None
+        self.tiers = []
+
+    def __bool__(self):
+        return self.won
+
+    def record(self) -> dict:
+        return {
+            "level": self.level,
+            "won": self.won,
+            "error": self.error,
+            "reason": self.reason,
+            "expected": self.expected,
+            "actual": self.actual,
+            "profile": self.profile,
+            "tiers": self.tiers,
+            **self.counters,
+        }
+
+    def render(self) -> str:
+        def value(v):
+            return [hex(i) for i in v] if isinstance(v, list) else hex(v)
+
+        lines = []
+        if self.error is not None:
+            lines.append(f"ERROR: {self.error}")
+        if self.reason is not None:
+            lines.append(self.reason)
+        if self.regs is not None:
+            lines += format_registers(self.regs, self.entry_regs)
+        if not self.won and self.expected:
+            lines.append("[!] ------------------------- [!]")
+            if self.inputs:
+                lines.append("Input:")
+                lines += [f"\t{name} = {value(v)}" for name, v in self.inputs.items()]
+            lines.append("Correct output:")
+            lines += [f"\t{name} = {value(v)}" for name, v in self.expected.items()]
+            lines.append("Your output:")
+            lines += [f"\t{name} = {value(v)}" for name, v in self.actual.items()]
+            lines.append("[!] ------------------------- [!]")
+        if self.won and self.profile is not None:
+            p = self.profile
+            lines.append(
+                f"Performance{'' if p['complete'] else ' (profile cut short)'}: "
+                f"{p['instructions']} instructions, {p['loads']} loads, {p['stores']} stores, "
+                f"{p['taken_branches']} taken branches, ~{p['cycles']} cycles ({p['cost_model']} cost model)"
+            )
+        if self.won and self.tiers:
+            lines.append("Performance tiers:")
+            for tier in self.tiers:
+                mark = "x" if tier["reached"] else " "
+                lines.append(f"\t[{mark}] {tier['name']}: at most {tier['max_insns']} instructions")
+        return "\n".join(lines)
+
+class InstructionFilter:
+    """
+    Mnemonic allow/deny list enforced once per basic block.
+
+    Each block is decoded on its first execution and the verdict (the first
+    offending mnemonic, or None) is cached by (address, size), so repeated
+    executions cost a dict lookup from UC_HOOK_BLOCK.  Only blocks inside the
+    watched code range are cached; a narrow UC_HOOK_MEM_WRITE over that range
+    drops the cache when the guest rewrites its own code.  Blocks outside the
+    range are decoded every time they run.
+    """
+
+    def __init__(self, insts: List, whitelist: bool, code_start: int, code_end: int):
+        self.insts = frozenset(insts)
+        self.whitelist = whitelist
+        self.code_start = code_start & ~(PAGE_SIZE - 1)
+        self.code_end = (code_end + PAGE_SIZE - 1) & ~(PAGE_SIZE - 1)
+        self.verdicts = {}
+
+    def install(self, level):
+        level.add_hook(UC_HOOK_BLOCK, self.block_hook, level)
+        level.add_hook(
+            UC_HOOK_MEM_WRITE,
+            self.code_write_hook,
+            begin=max(self.code_start - WRITE_SLACK, 0),
+            end=self.code_end - 1,
+        )
+
+    def check(self, code: bytes, address: int) -> Optional[str]:
+        decoded = 0
+        for _, size, mnemonic, _ in get_disassembler().disasm_lite(code, address):
+            if (mnemonic in self.insts) != self.whitelist:
+                return mnemonic
+            decoded += size
+        if decoded != len(code) and self.whitelist:
+            return "(undecodable)"
+        return None
+
+    def block_hook(self, uc, address, size, level):
+        key = (address, size)
+        try:
+            bad = self.verdicts[key]
+        except KeyError:
+            bad = self.check(bytes(uc.mem_read(address, size)), address)
+            if self.code_start <= address and address + size <= self.code_end:
+                self.verdicts[key] = bad
+
+        if bad is not None:
+            level.emu_err = "fail: this instruction is not allowed: %s" % bad
+            level.stop_emu(uc)
+
+    def code_write_hook(self, uc, access, address, size, value, user_data):
+        self.verdicts.clear()
+
+class MemoryGuards:
+    """
+    Out-of-bounds detection for LevelSpec.guards.
+
+    The whole pages of a guarded range become GuestMemory guard pages, which
+    are never mapped, so they cost nothing until touched.  What is left at
+    either end (an array's key words) is compared after the
+    run with what the grader seeded there: any UC_HOOK_MEM_WRITE, however
+    narrow its range, takes every guest access off unicorn's fast path.
+    Only when those bytes changed is the run replayed with a write hook
+    over just them (plus WRITE_SLACK below, for wide stores that start
+    before them) to find the offending store.  A store that leaves the
+    bytes as they were is not a violation.  The first violation fails the
+    run with its PC and address.
+    """
+
+    ACCESS = {UC_MEM_WRITE_UNMAPPED: "write to", UC_MEM_FETCH_UNMAPPED: "fetch from"}
+
+    def __init__(self, ranges: List[tuple]):
+        self.pages = []
+        self.words = []
+        for begin, end in ranges:
+            first = (begin + PAGE_SIZE - 1) & ~(PAGE_SIZE - 1)
+            last = end & ~(PAGE_SIZE - 1)
+            if first < last:
+                self.pages.append((first, last))
+                self.words += [(lo, hi) for lo, hi in ((begin, first), (last, end)) if lo < hi]
+            else:
+                self.words.append((begin, end))
+        self.level = None
+        self.seeded = []
+        self.hooks = []
+        self.violation = None
+
+    def install(self, level: "EmbryoARMBase"):
+        self.level = level
+        for begin, end in self.pages:
+            level.memory.guard(begin, end)
+        level.memory.on_guard = self.page_hook
+
+    def arm(self):
+        """Take the guarded words' contents as seeded, before a run."""
+        self.seeded = []
+        for begin, end in self.words:
+            try:
+                self.seeded.append((begin, bytes(self.level.read_mem(begin, end - begin))))
+            except UcError:
+                # outside the reservations, so never writable either
+                continue
+
+    def breached(self) -> Optional[int]:
+        """Lowest guarded address whose contents changed since arm(), if any."""
+        for begin, data in self.seeded:
+            now = self.level.emu.mem_read(begin, len(data))
+            if now != data:
+                return begin + next(i for i, (a, b) in enumerate(zip(data, now)) if a != b)
+        return None
+
+    def watch(self):
+        for begin, end in self.words:
+            self.hooks.append(self.level.attach_hook(
+                UC_HOOK_MEM_WRITE, self.write_hook, (begin, end), begin=max(begin - WRITE_SLACK, 0), end=end - 1,
+            ))
+
+    def unwatch(self):
+        for hook in self.hooks:
+            self.level.detach_hook(hook)
+        self.hooks = []
+
+    def report(self, uc, access: str, address: int):
+        if self.level.emu_err is not None:
+            return
+        pc = uc.reg_read(UC_ARM64_REG_PC)
+        self.violation = (pc, address)
+        self.level.emu_err = f"fail: out-of-bounds {access} {hex(address)} at pc {hex(pc)}"
+
+    def page_hook(self, uc, access, address):
+        self.report(uc, self.ACCESS.get(access, "read of"), address)
+
+    def write_hook(self, uc, access, address, size, value, bounds):
+        begin, end = bounds
+        if address + size <= begin or address >= end:
+            return
+        self.report(uc, "write to", max(address, begin))
+        self.level.stop_emu(uc)
+
+class GuestMemory:
+    """
+    Sparse guest address space.
+
+    Levels reserve the ranges a guest may touch, but pages are only mapped
+    when the grader seeds them or on the guest's first access to them through
+    an unmapped-access hook, up to max_pages.  resident() is the guest memory
+    a grading actually used.  Buffers mapped with map_buffer() are the
+    level's own data in host memory and count against neither.  Guard
+    pages are never mapped; a guest access to one is passed to on_guard.
+    """
+
+    def __init__(self, uc, max_pages: int):
+        self.uc = uc
+        self.max_pages = max_pages
+        self.reserved = []
+        self.pages = set()
+        self.buffers = []
+        self.guards = []
+        self.limit_err = None
+        # called as on_map(page, perms) for every newly mapped page
+        self.on_map = None
+        # called as on_guard(uc, access, address) for an access to a guard page
+        self.on_guard = None
+
+    def reserve(self, begin: int, size: int, perms: int = UC_PROT_ALL):
+        self.reserved.append((begin, begin + size, perms))
+
+    def guard(self, begin: int, end: int):
+        """Keep the pages of [begin, end), reserved or not, unmapped."""
+        self.guards.append((begin, end))
+
+    def perms(self, page: int) -> Optional[int]:
+        for begin, end in self.guards:
+            if begin <= page < end:
+                return None
+        for begin, end, perms in self.reserved:
+            if begin <= page < end:
+                return perms
+        return None
+
+    def map(self, address: int, size: int) -> bool:
+        """
+        Map every page overlapping [address, address + size); runs of new
+        pages are mapped with one mem_map call.  False if any page is outside
+        the reservations or the page limit would be exceeded.
+        """
+        new = [
+            page
+            for page in range(address & ~(PAGE_SIZE - 1), address + size, PAGE_SIZE)
+            if page not in self.pages and not self.in_buffer(page)
+        ]
+        if not new:
+            return True
+        if len(self.pages) + len(new) > self.max_pages:
+            self.limit_err = f"exceeded guest memory limit of {self.max_pages * PAGE_SIZE // 1024} KiB"
+            return False
+        perms = [self.perms(page) for page in new]
+        if None in perms:
+            return False
+
+        run_start = 0
+        for i in range(1, len(new) + 1):
+            if i == len(new) or new[i] != new[i - 1] + PAGE_SIZE or perms[i] != perms[run_start]:
+                self.uc.mem_map(new[run_start], (i - run_start) * PAGE_SIZE, perms[run_start])
+                run_start = i
+        self.pages.update(new)
+        if self.on_map is not None:
+            for page, page_perms in zip(new, perms):
+                self.on_map(page, page_perms)
+        return True
+
+    def map_buffer(self, address: int, buffer, perms: int = UC_PROT_READ):
+        """
+        Map a writable host buffer of whole pages (an mmap, a NumPy array)
+        at `address` with mem_map_ptr, so the guest reads it in place
+        without a copy.  The buffer is kept alive with the mapping.
+        """
+        view = memoryview(buffer).cast("B")
+        pointer = ctypes.addressof(ctypes.c_char.from_buffer(view))
+        self.uc.mem_map_ptr(address, view.nbytes, perms, pointer)
+        self.buffers.append((address, address + view.nbytes, buffer))
+
+    def in_buffer(self, page: int) -> bool:
+        return any(begin <= page < end for begin, end, _ in self.buffers)
+
+    def unmapped_hook(self, uc, access, address, size, value, user_data):
+        if self.on_guard is not None:
+            for begin, end in self.guards:
+                if begin <= address < end:
+                    self.on_guard(uc, access, address)
+                    return False
+        return self.map(address, max(size, 1))
+
+    def resident(self) -> int:
+        return len(self.pages) * PAGE_SIZE
+
+class GradingMetrics:
+    """
+    Timings and counters for one grading, written by run() as a single JSON
+    line to EmbryoARMBase.METRICS_SINK.
+
+    Levels only create one when a sink is configured.  Without it no hook is
+    wrapped and each phase costs a None check.
+
+    The graded runs carry no counting hook, so instructions and blocks count
+    only what is known without one: every run stopped by emu_start's count
+    ran its INSN_BUDGET, tier runs included, and a passing grading adds the
+    totals of its profile replay (EmbryoARMBase.profile_run, one run or the
+    first trial).
+    """
+
+    __slots__ = (
+        "level", "phases", "instructions", "blocks", "hook_calls",
+        "trials", "emulations", "cpu_start",
+    )
+
+    COUNTERS = ("instructions", "blocks", "hook_calls", "trials", "emulations")
+
+    def __init__(self, level: str):
+        self.level = level
+        self.reset()
+
+    def reset(self):
+        self.phases = {}
+        self.instructions = 0
+        self.blocks = 0
+        self.hook_calls = 0
+        self.trials = 0
+        self.emulations = 0
+        self.cpu_start = time.process_time()
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.monotonic() - start)
+
+    def add_time(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def wrap_hook(self, callback):
+        def counted(*args):
+            self.hook_calls += 1
+            start = time.monotonic()
+            try:
+                return callback(*args)
+            finally:
+                self.add_time("hooks", time.monotonic() - start)
+        return counted
+
+    def counters(self) -> dict:
+        return {name: getattr(self, name) for name in self.COUNTERS}
+
+    def merge(self, counters: dict, phases: dict):
+        for name, value in counters.items():
+            setattr(self, name, getattr(self, name) + value)
+        for name, seconds in phases.items():
+            self.add_time(name, seconds)
+
+    def record(self, won: bool, level: "EmbryoARMBase") -> dict:
+        return {
+            "level": self.level,
+            "won": won,
+            "emu_err": level.emu_err,
+            "budget_err": level.budget_err,
+            "phases": self.phases,
+            **self.counters(),
+            "trials": max(self.trials, 1),
+            "cpu_time": time.process_time() - self.cpu_start,
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "guest_resident_kb": level.memory.resident() // 1024 if level.memory is not None else 0,
+        }
+
+    def emit(self, sink: str, won: bool, level: "EmbryoARMBase"):
+        with open(sink, "a") as fp:
+            fp.write(json.dumps(self.record(won, level)) + "\n")
+
+class CostModel:
+    """
+    Per-mnemonic cycle costs for ExecutionProfile's estimate: `cycles` maps a
+    mnemonic to its cost, anything else costs `default`, and every taken
+    branch adds `taken_branch` for the refetch.
+    """
+
+    __slots__ = ("name", "cycles", "default", "taken_branch")
+
+    def __init__(self, name: str, cycles: dict, default: int = 1, taken_branch: int = 0):
+        self.name = name
+        self.cycles = cycles
+        self.default = default
+        self.taken_branch = taken_branch
+
+    def cost(self, mnemonic: str) -> int:
+        return self.cycles.get(mnemonic, self.default)
+
+# rough result latencies of a dual-issue in-order core (Cortex-A53 class)
+IN_ORDER_COSTS = CostModel(
+    "in-order",
+    {
+        **dict.fromkeys(("mul", "madd", "msub", "mneg", "smull", "umull", "smaddl", "umaddl"), 3),
+        **dict.fromkeys(("smulh", "umulh"), 6),
+        **dict.fromkeys(("udiv", "sdiv"), 12),
+        **dict.fromkeys(("ldr", "ldrb", "ldrh", "ldrsb", "ldrsh", "ldrsw", "ldur", "ldurb", "ldurh", "ldursw"), 3),
+        **dict.fromkeys(("ldp", "ldpsw"), 3),
+    },
+    taken_branch=2,
+)
+
+class ExecutionProfile:
+    """
+    Dynamic instruction mix and cycle estimate of one passing run, reported
+    with the verdict.
+
+    Counting is per basic block: the UC_HOOK_BLOCK callback bumps a counter
+    for the (address, size) it enters and decodes a block only the first
+    time it is seen, so the per-instruction totals are hit count times the
+    block's shape.  A block entered anywhere but where the previous one
+    ended was reached by a taken branch.
+
+    Even a block hook slows deep recursion down several times over, so the
+    graded runs never carry it: EmbryoARMBase.profile_run() replays one run
+    under it afterwards, bounded by PROFILE_INSN_BUDGET, and complete says
+    whether that replay got to the end.
+    """
+
+    __slots__ = ("cost_model", "hits", "shapes", "taken", "next_pc", "hook", "complete")
+
+    def __init__(self, cost_model: CostModel):
+        self.cost_model = cost_model
+        self.hits = {}
+        self.shapes = {}
+        self.taken = 0
+        self.next_pc = None
+        self.hook = None
+        self.complete = False
+
+    def install(self, level: "EmbryoARMBase", begin: int):
+        self.next_pc = begin
+        if self.hook is None:
+            self.hook = level.attach_hook(UC_HOOK_BLOCK, self.count_block)
+
+    def uninstall(self, level: "EmbryoARMBase"):
+        if self.hook is not None:
+            level.detach_hook(self.hook)
+            self.hook = None
+
+    def count_block(self, uc, address, size, user_data):
+        key = (address, size)
+        try:
+            self.hits[key] += 1
+        except KeyError:
+            self.hits[key] = 1
+            if key not in self.shapes:
+                self.shapes[key] = self.shape(bytes(uc.mem_read(address, size)), address)
+        if address != self.next_pc:
+            self.taken += 1
+        self.next_pc = address + size
+
+    def shape(self, code: bytes, address: int) -> tuple:
+        """(instructions, loads, stores, cycles) of one pass through a block."""
+        insns = loads = stores = cycles = 0
+        for _, _, mnemonic, _ in get_disassembler().disasm_lite(code, address):
+            insns += 1
+            loads += mnemonic.startswith("ld")
+            stores += mnemonic.startswith("st")
+            cycles += self.cost_model.cost(mnemonic)
+        return insns, loads, stores, cycles
+
+    def summary(self) -> dict:
+        totals = [0, 0, 0, 0]
+        for key, count in self.hits.items():
+            for i, value in enumerate(self.shapes[key]):
+                totals[i] += count * value
+        insns, loads, stores, cycles = totals
+        return {
+            "instructions": insns,
+            "loads": loads,
+            "stores": stores,
+            "taken_branches": self.taken,
+            "cycles": cycles + self.taken * self.cost_model.taken_branch,
+            "cost_model": self.cost_model.name,
+            "complete": self.complete,
+        }
+
+class TrialVectors:
+    """
+    A batch of generated trial inputs for EmbryoARMBase.verify_vectors.
+
+    regs maps a register to its per-trial input values, mem maps an address to
+    an (n, size) uint8 array whose i-th row is written there before trial i,
+    and expect maps a register to its per-trial expected value.
+    """
+
+    __slots__ = ("count", "regs", "mem", "expect")
+
+    def __init__(self, count: int, regs: dict, expect: dict, mem: Optional[dict] = None):
+        self.count = count
+        self.regs = regs
+        self.expect = expect
+        self.mem = mem or {}
+
+def qwords(*values: int) -> bytes:
+    """Little-endian 64-bit words, for LevelSpec.mem."""
+    words = array.array("Q", values)
+    if sys.byteorder != "little":
+        words.byteswap()
+    return words.tobytes()
+
+class Mem:
+    """
+    A 64-bit word of guest memory in LevelSpec.expect: at a fixed address, or
+    at the address a register holds once the run is over.
+    """
+
+    __slots__ = ("address", "reg")
+
+    def __init__(self, address: int = 0, reg: Optional[int] = None):
+        self.address = address
+        self.reg = reg
+
+    def locate(self, regs: RegisterSnapshot) -> int:
+        return self.address if self.reg is None else regs[self.reg]
+
+    def label(self) -> str:
+        return f"[{hex(self.address)}]" if self.reg is None else f"[{reg_name(self.reg)}]"
+
+class LevelSpec:
+    """
+    What a level seeds, allows and expects; EmbryoARMBase.trace() runs it.
+
+        regs       registers set before the run, written in one batch
+        mem        {address: bytes} seeded before the run; images that touch
+                   are merged so each run does one write_mem per region
+        max_insns  submission length limit in instructions, exactly that
+                   many with exact=True
+        allow      mnemonic whitelist, checked once per basic block
+        harness    A64Template entered instead of the submission
+        hooks      extra (hook type, callback, begin, end) to install, for
+                   the addresses begin to end inclusive
+        expect     {register or Mem: value} the run must end with
+        blocks     block addresses the run must execute, in order
+        guards     (begin, end) ranges the run must stay out of (see
+                   MemoryGuards): no access to their whole pages, no
+                   write to the rest
+        inputs     shown on failure; the seeded registers by default
+        trials     LevelSpecs run one after another from a snapshot taken
+                   after this spec's own seeding, each with its own regs,
+                   mem, expect and inputs
+
+    A run that faults or breaks the whitelist fails whatever its final state.
+    """
+
+    __slots__ = (
+        "regs", "images", "max_insns", "exact", "allow", "harness", "hooks", "expect", "blocks", "guards", "inputs",
+        "trials",
+    )
+
+    def __init__(
+        self,
+        regs: Optional[dict] = None,
+        mem: Optional[dict] = None,
+        max_insns: Optional[int] = None,
+        exact: bool = False,
+        allow: Optional[List[str]] = None,
+        harness: Optional[A64Template] = None,
+        hooks: Optional[List[tuple]] = None,
+        expect: Optional[dict] = None,
+        blocks: Optional[List[int]] = None,
+        guards: Optional[List[tuple]] = None,
+        inputs: Optional[dict] = None,
+        trials: Optional[List["LevelSpec"]] = None,
+    ):
+        self.regs = regs or {}
+        self.images = []
+        for address, data in sorted((mem or {}).items()):
+            if self.images and self.images[-1][0] + len(self.images[-1][1]) == address:
+                self.images[-1][1] += data
+            else:
+                self.images.append([address, bytearray(data)])
+        self.images = [(address, bytes(data)) for address, data in self.images]
+        self.max_insns = max_insns
+        self.exact = exact
+        self.allow = allow
+        self.harness = harness
+        self.hooks = hooks or []
+        self.expect = expect or {}
+        self.blocks = blocks
+        self.guards = guards or []
+        self.inputs = inputs if inputs is not None else {reg_name(reg): value for reg, value in self.regs.items()}
+        self.trials = trials or []
+
+    def length_error(self, size: int) -> Optional[str]:
+        if self.max_insns is None:
+            return None
+        limit = 4 * self.max_insns
+        if self.exact and size != limit:
+            plural = "s" if self.max_insns > 1 else ""
+            return f"Only submit {self.max_insns} aarch64 instruction{plural}!  {size} bytes received, but expecting {limit}!"
+        if size > limit:
+            return f"Maximum {self.max_insns} aarch64 instructions allowed!  {size} bytes received, but expecting <={limit}!"
+        return None
+
+    def compare(self, regs: RegisterSnapshot, words: dict, visited: Optional[List[int]] = None):
+        """
+        (matched, expected, actual) for a finished run, given its registers,
+        the value of each Mem in expect and the blocks it executed.
+        """
+        expected, actual = {}, {}
+        for where, value in self.expect.items():
+            if isinstance(where, Mem):
+                label, got = where.label(), words[where]
+            else:
+                label, got = reg_name(where), regs[where]
+            expected[label] = value
+            actual[label] = got
+        if self.blocks is not None:
+            expected["blocks"] = self.blocks
+            actual["blocks"] = visited
+        return expected == actual, expected, actual
+
+U64_MAX = 2 ** 64 - 1
+
+class FuzzField:
+    """
+    One named input of a level, for fuzz.py: how to draw it, the edge values
+    to try first, and smaller values to shrink a diverging input towards.
+    widen() trades the level's own input contract for the full 64-bit range.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def draw(self, rng: random.Random):
+        raise NotImplementedError
+
+    def edges(self) -> list:
+        raise NotImplementedError
+
+    def shrink(self, value):
+        raise NotImplementedError
+
+    def widen(self) -> "FuzzField":
+        raise NotImplementedError
+
+class IntField(FuzzField):
+    """An integer in [lo, hi]; edges are the bounds and any power-of-two boundary between them."""
+
+    def __init__(self, name: str, lo: int, hi: int):
+        super().__init__(name)
+        self.lo = lo
+        self.hi = hi
+
+    def draw(self, rng):
+        return rng.randint(self.lo, self.hi)
+
+    def edges(self):
+        values = {self.lo, self.lo + 1, self.hi - 1, self.hi}
+        for bits in (8, 16, 31, 32, 63):
+            values.update((2 ** bits - 1, 2 ** bits))
+        return sorted(v for v in values if self.lo <= v <= self.hi)
+
+    def shrink(self, value):
+        # lo first, then ever closer to value
+        step = value - self.lo
+        while step > 0:
+            yield value - step
+            step //= 2
+
+    def widen(self):
+        return IntField(self.name, 0, U64_MAX)
+
+class ChoiceField(FuzzField):
+    """One of a fixed set of integers, all of them edges."""
+
+    def __init__(self, name: str, choices: List[int]):
+        super().__init__(name)
+        self.choices = sorted(choices)
+
+    def draw(self, rng):
+        return rng.choice(self.choices)
+
+    def edges(self):
+        return self.choices
+
+    def shrink(self, value):
+        return [c for c in self.choices if c < value]
+
+    def widen(self):
+        return IntField(self.name, 0, U64_MAX)
+
+class ArrayField(FuzzField):
+    """A list of min_len to max_len integers, each an `item`."""
+
+    def __init__(self, name: str, min_len: int, max_len: int, item: IntField):
+        super().__init__(name)
+        self.min_len = min_len
+        self.max_len = max_len
+        self.item = item
+
+    def draw(self, rng):
+        return [self.item.draw(rng) for _ in range(rng.randint(self.min_len, self.max_len))]
+
+    def edges(self):
+        return [[value] * size for size in (self.min_len, self.max_len) for value in (self.item.lo, self.item.hi)]
+
+    def shrink(self, value):
+        # drop ever smaller runs, then reset single items to lo
+        run = len(value) // 2
+        while run:
+            for start in range(0, len(value) - run + 1, run):
+                if len(value) - run >= self.min_len:
+                    yield value[:start] + value[start + run:]
+            run //= 2
+        for i, item in enumerate(value):
+            if item != self.item.lo:
+                yield value[:i] + [self.item.lo] + value[i + 1:]
+
+    def widen(self):
+        return ArrayField(self.name, 0, self.max_len, self.item.widen())
+
+class PerformanceTier:
+    """
+    A bar above passing: `spec` run as a single emulation must end correct
+    within max_insns of the submission's instructions.  unicorn enforces
+    the bound through emu_start's count, so a tier costs no hook; `overhead`
+    is what the grader's own driver code adds to that count.
+    """
+
+    __slots__ = ("name", "max_insns", "spec", "overhead")
+
+    def __init__(self, name: str, max_insns: int, spec: LevelSpec, overhead: int = 0):
+        self.name = name
+        self.max_insns = max_insns
+        self.spec = spec
+        self.overhead = overhead
+
+class TraceRecorder:
+    """
+    Fixed-size ring buffer of the guest's execution history.
+
+    One record is taken per basic block, or per instruction with
+    per_insn=True: the PC and X0-X30 and SP on entry.  Records live in two
+    preallocated unsigned 64-bit arrays, so memory use is fixed at
+    8 * (1 + len(REGS)) bytes per slot however long the submission runs, and
+    the hook itself only reads the registers into the next slot.  Which
+    registers changed is worked out from consecutive records when the trace
+    is printed or dumped, not while recording.  With RegisterFile's direct
+    batch read a record costs about 3.5us including the hook dispatch.
+
+    dump() writes the kept records as a header followed by, per record, the
+    PC, a bitmask of the registers that changed since the previous record
+    (all of them for the first) and the changed values, all little-endian:
+
+        header  "A64T" u16 version, u16 len(REGS), u32 records, u64 dropped
+        record  u64 pc, u32 mask, u64 value for each set bit of mask
+    """
+
+    REGS = RegisterFile.XREGS + (UC_ARM64_REG_SP,)
+    MAGIC = b"A64T"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHHIQ")
+    RECORD = struct.Struct("<QI")
+
+    __slots__ = ("capacity", "per_insn", "pcs", "regs", "total", "hook", "file")
+
+    def __init__(self, capacity: int, per_insn: bool = False):
+        self.capacity = capacity
+        self.per_insn = per_insn
+        self.pcs = array.array("Q", bytes(8 * capacity))
+        self.regs = array.array("Q", bytes(8 * capacity * len(self.REGS)))
+        self.total = 0
+        self.hook = None
+        self.file = None
+
+    def install(self, level: "EmbryoARMBase"):
+        if self.hook is None:
+            self.file = RegisterFile(level.emu, self.REGS)
+            self.hook = level.attach_hook(UC_HOOK_CODE if self.per_insn else UC_HOOK_BLOCK, self.record)
+
+    def uninstall(self, level: "EmbryoARMBase"):
+        if self.hook is not None:
+            level.detach_hook(self.hook)
+            self.hook = None
+
+    def record(self, uc, address, size, user_data):
+        slot = self.total % self.capacity
+        self.pcs[slot] = address
+        self.file.read_into(self.regs, slot * len(self.REGS))
+        self.total += 1
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def records(self):
+        """(pc, changed) oldest first, changed being [(reg, value)] since the previous record."""
+        width = len(self.REGS)
+        previous = None
+        for n in range(self.total - len(self), self.total):
+            slot = n % self.capacity
+            values = self.regs[slot * width:(slot + 1) * width]
+            changed = [
+                (reg, value)
+                for i, (reg, value) in enumerate(zip(self.REGS, values))
+                if previous is None or previous[i] != value
+            ]
+            yield self.pcs[slot], changed
+            previous = values
+
+    def print_tail(self, limit: int = 32):
+        kept = len(self)
+        print(f"---- last {min(kept, limit)} of {self.total} {'instructions' if self.per_insn else 'blocks'} ----")
+        for n, (pc, changed) in enumerate(self.records()):
+            if n >= kept - limit:
+                print(f"{hex(pc)}\t" + " ".join(f"{reg_name(reg)}={hex(value)}" for reg, value in changed))
+
+    def dump(self, fp):
+        index = {reg: i for i, reg in enumerate(self.REGS)}
+        fp.write(self.HEADER.pack(self.MAGIC, self.VERSION, len(self.REGS), len(self), self.total - len(self)))
+        for pc, changed in self.records():
+            mask = sum(1 << index[reg] for reg, _ in changed)
+            fp.write(self.RECORD.pack(pc, mask))
+            fp.write(struct.pack(f"<{len(changed)}Q", *(value for _, value in changed)))
+
+    @classmethod
+    def load(cls, fp):
+        """Read back a dump(): yields (pc, full register tuple in REGS order)."""
+        magic, version, width, count, _ = cls.HEADER.unpack(fp.read(cls.HEADER.size))
+        if magic != cls.MAGIC or version != cls.VERSION or width != len(cls.REGS):
+            raise ValueError("not a trace file written by this version")
+        values = [0] * width
+        for _ in range(count):
+            pc, mask = cls.RECORD.unpack(fp.read(cls.RECORD.size))
+            bits = [i for i in range(width) if mask >> i & 1]
+            for i, value in zip(bits, struct.unpack(f"<{len(bits)}Q", fp.read(8 * len(bits)))):
+                values[i] = value
+            yield pc, tuple(values)
+
+class BudgetExceeded(UcError):
+    """
+    Raised by EmbryoARMBase.emulate when a run hits its instruction or time
+    budget.  It is a UcError so the levels' existing error handling reports it.
+    """
+
+    def __init__(self, msg: str):
+        self.msg = msg
+
+    def __str__(self):
+        return self.msg
+
+class TrialPool:
+    """
+    Runs a level's independent unit-test trials in forked worker processes.
+
+    Workers are forked after the level has taken its snapshot, so each one
+    starts with its own warm copy of the emulator and restores it before every
+    trial.  Trial indices are handed out through a queue to keep long and short
+    trials balanced.  Workers send back each trial's GradeResult.  Results
+    arrive in any order, so the pool waits for every trial before the
+    lowest-indexed failure and reports that one, as the in-process loop
+    would; then every worker is terminated.
+
+    The workers may share CPUs with each other and with other gradings, so
+    each one gets TIME_BUDGET times the worker count for a single
+    emulation (still within TOTAL_TIME_BUDGET); INSN_BUDGET is unchanged.
+    """
+
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, level: "EmbryoARMBase", workers: int):
+        self.level = level
+        self.workers = workers
+        self.failed = None
+
+    def worker(self, trials: List, tasks, results):
+        self.level.TIME_BUDGET = min(self.level.TIME_BUDGET * self.workers, self.level.TOTAL_TIME_BUDGET)
+        metrics = self.level.metrics
+        while True:
+            idx = tasks.get()
+            if idx is None:
+                return
+            if metrics is not None:
+                metrics.reset()
+                metrics.trials = 1
+            try:
+                self.level.restore()
+                result = self.level.unit_test_user_code(*trials[idx])
+                if self.level.budget_err is not None:
+                    result.won = False
+            except Exception:
+                result = GradeResult(self.level.name, False, error=traceback.format_exc())
+            stats = (metrics.counters(), metrics.phases) if metrics is not None else None
+            results.put((idx, result, stats))
+
+    def run(self, trials: List) -> Optional[GradeResult]:
+        """The lowest-indexed failing trial's result, or None when every trial passed."""
+        ctx = multiprocessing.get_context("fork")
+        tasks = ctx.Queue()
+        results = ctx.Queue()
+        for idx in range(len(trials)):
+            tasks.put(idx)
+        for _ in range(self.workers):
+            tasks.put(None)
+
+        procs = [
+            ctx.Process(target=self.worker, args=(trials, tasks, results), daemon=True)
+            for _ in range(min(self.workers, len(trials)))
+        ]
+        for proc in procs:
+            proc.start()
+
+        try:
+            # trials before `first` still to report, and the lowest failure so far
+            first = len(trials)
+            pending = set(range(first))
+            failure = None
+            while pending:
+                try:
+                    idx, result, stats = results.get(timeout=self.POLL_INTERVAL)
+                except queue.Empty:
+                    if not any(proc.is_alive() for proc in procs):
+                        return GradeResult(self.level.name, False, error="trial workers exited unexpectedly")
+                    continue
+                pending.discard(idx)
+                if stats is not None:
+                    self.level.metrics.merge(*stats)
+                if not result.won and idx < first:
+                    first, failure = idx, result
+                    pending = {i for i in pending if i < first}
+            if failure is not None:
+                self.failed = trials[first]
+            return failure
+        finally:
+            for proc in procs:
+                if proc.is_alive():
+                    proc.terminate()
+                proc.join()
 
 class EmbryoARMBase:
     """
@@ -79,6 +1287,10 @@ class EmbryoARMBase:
 
     === Functions ===
     15. fibonacci
+
+    === Large data ===
+    16. array sum over millions of qwords
+    17. average over millions of qwords
     """
 
     BASE_STACK = 0x7FFFFF000000
@@ -93,74 +1305,606 @@ class EmbryoARMBase:
     LIB_OFFSET = 0x3000
     LIB_ADDR = BASE_ADDR + LIB_OFFSET
 
+    # host buffers of the large-data levels (see GuestMemory.map_buffer)
+    LARGE_ADDR = 0x10000000
+
+    # Limits for a single emu_start (enforced by unicorn itself through
+    # count/timeout) and for all emulation done while grading one submission.
+    # With TRIAL_WORKERS > 1 the total applies to each worker (see TrialPool).
+    INSN_BUDGET = 1_000_000
+    TIME_BUDGET = 5.0
+    TOTAL_TIME_BUDGET = 30.0
+
+    # JSON lines file for GradingMetrics records; None disables instrumentation
+    METRICS_SINK: Optional[str] = None
+
+    # reserved guest ranges: code and data from BASE_ADDR, and the stack
+    # from BASE_STACK up to RSP_INIT; the sizes the baseline mapped up front
+    CODE_SIZE = 2 * 1024 * 1024
+    STACK_SIZE = 2 * 1024 * 1024
+
+    # guest pages (PAGE_SIZE) a grading may have mapped at once; a level
+    # that reserves more should raise it with its reservations
+    MAX_GUEST_PAGES = (CODE_SIZE + STACK_SIZE) // PAGE_SIZE
+
+    # ring-buffer records of execution kept for failure reports (see
+    # TraceRecorder); 0 disables, TRACE_INSNS records every instruction
+    # instead of every block, and failing runs are dumped into TRACE_DIR
+    TRACE_DEPTH = 0
+    TRACE_INSNS = False
+    TRACE_DIR: Optional[str] = None
+
+    # instruction mix and cycle estimate of a passing submission, from a
+    # replay of one run of at most PROFILE_INSN_BUDGET instructions (see
+    # ExecutionProfile); COST_MODEL prices the cycles
+    PROFILE = True
+    PROFILE_INSN_BUDGET = 250_000
+    COST_MODEL = IN_ORDER_COSTS
+
+    # (name, max_insns, size) performance tiers tried in order after a pass,
+    # each on tier_spec(size); the first one missed ends the attempt
+    TIERS: List[tuple] = []
+    # argument table and results of tier_call_spec's driver
+    TIER_ADDR = BASE_ADDR + 0x100000
+
+    # extra randomized trials for levels that define trial_vectors(); 0
+    # disables (see verify_vectors)
+    VERIFY_TRIALS = 0
+
+    # worker processes for multi-trial levels; 1 runs trials in-process
+    TRIAL_WORKERS = 1
+
     def create_emu(self):
         mu = Uc(UC_ARCH_ARM64, UC_MODE_ARM)
+        self.emu = mu
+        self.pristine_ctx = None
 
-        mu.mem_map(self.BASE_ADDR, 2 * 1024 * 1024)
-        mu.mem_write(self.BASE_ADDR + self.CODE_OFFSET, self.asm)
-        mu.mem_map(self.BASE_STACK, 2 * 1024 * 1024)
-        mu.reg_write(UC_ARM64_REG_SP, self.RSP_INIT)
+        self.memory = GuestMemory(mu, self.MAX_GUEST_PAGES)
+        self.memory.reserve(self.BASE_ADDR, self.CODE_SIZE)
+        self.memory.reserve(self.BASE_STACK, self.STACK_SIZE)
+        for address, buffer in self.buffers:
+            self.memory.map_buffer(address, buffer)
+        self.add_hook(UC_HOOK_MEM_UNMAPPED, self.memory.unmapped_hook)
 
-        for reg in range(UC_ARM64_REG_X0, UC_ARM64_REG_X28 + 1):
-            mu.reg_write(reg, 0x0)
-        mu.reg_write(UC_ARM64_REG_X29, 0x0)
-        mu.reg_write(UC_ARM64_REG_X30, 0x0)
+        self.write_mem(self.BASE_ADDR + self.CODE_OFFSET, self.asm)
+        self.regs = RegisterFile(mu)
+        self.regs.write({**dict.fromkeys(RegisterFile.XREGS, 0), UC_ARM64_REG_SP: self.RSP_INIT})
+        self.entry_regs = None
 
-        self.emu = mu
+        if self.TRACE_DEPTH:
+            self.recorder = TraceRecorder(self.TRACE_DEPTH, self.TRACE_INSNS)
+            self.recorder.install(self)
 
     def __init__(self, asm):
         self.asm: Optional[bytes] = asm
         self.emu_err = None
+        self.pristine_ctx = None
+        self.memory = None
+        self.regs = None
+        self.entry_regs = None
+        self.inst_filter = None
+        self.guards = None
+        self.recorder = None
+        self.code_range = None
+        self.visited = []
+        # (address, buffer) mapped read-only into every emulator in place
+        self.buffers = []
+        self.emu_stopped = False
+        self.emu_time = 0.0
+        self.budget_err = None
+        self.name = type(self).__name__
+        self.metrics = GradingMetrics(self.name) if self.METRICS_SINK else None
+        self.profile = None
+
+    def emulate(self, begin: int, until: int):
+        """
+        emu_start bounded by the level's budgets.
+
+        A run that neither reached `until` nor was stopped on purpose (see
+        stop_emu) ran out of budget and raises BudgetExceeded.
+        """
+        remaining = self.TOTAL_TIME_BUDGET - self.emu_time
+        if remaining <= 0:
+            self.budget_err = f"exceeded total time budget of {self.TOTAL_TIME_BUDGET:.1f}s"
+            raise BudgetExceeded(self.budget_err)
+        timeout = min(self.TIME_BUDGET, remaining)
+
+        self.emu_stopped = False
+        self.entry_regs = self.regs.read()
+        start = time.monotonic()
+        try:
+            self.emu.emu_start(begin, until, timeout=int(timeout * 1_000_000), count=self.INSN_BUDGET)
+        except UcError:
+            if self.memory.limit_err is None:
+                raise
+            self.budget_err = self.memory.limit_err
+            raise BudgetExceeded(self.budget_err)
+        finally:
+            elapsed = time.monotonic() - start
+            self.emu_time += elapsed
+            if self.metrics is not None:
+                self.metrics.emulations += 1
+                self.metrics.add_time("emulate", elapsed)
+
+        if self.emu_stopped or self.emu.reg_read(UC_ARM64_REG_PC) == until:
+            return
+        if self.emu.query(UC_QUERY_TIMEOUT):
+            self.budget_err = f"exceeded time budget after {elapsed:.2f}s"
+        else:
+            self.budget_err = f"exceeded budget after {self.INSN_BUDGET} instructions"
+            if self.metrics is not None:
+                self.metrics.instructions += self.INSN_BUDGET
+        raise BudgetExceeded(self.budget_err)
+
+    def add_hook(self, htype: int, callback, user_data=None, begin: int = 1, end: int = 0):
+        if self.metrics is not None:
+            callback = self.metrics.wrap_hook(callback)
+        return self.emu.hook_add(htype, callback, user_data, begin, end)
+
+    def attach_hook(self, htype: int, callback, user_data=None, begin: int = 1, end: int = 0):
+        """
+        add_hook() on an emulator that may already have run: blocks translated
+        before the hook existed would not call it, so unicorn's translation
+        cache is flushed.
+        """
+        hook = self.add_hook(htype, callback, user_data, begin, end)
+        self.emu.ctl_flush_tb()
+        return hook
+
+    def detach_hook(self, hook):
+        """Remove a hook added by attach_hook(), flushing for the same reason."""
+        self.emu.hook_del(hook)
+        self.emu.ctl_flush_tb()
+
+    def phase(self, name: str):
+        if self.metrics is None:
+            return contextlib.nullcontext()
+        return self.metrics.phase(name)
+
+    def stop_emu(self, uc):
+        self.emu_stopped = True
+        uc.emu_stop()
+
+    def snapshot(self):
+        """
+        Capture the emulator's current state so restore() can return to it.
+
+        Writable memory is re-protected read-only.  The first guest write to a
+        page faults into dirty_page_hook, which keeps a pristine copy of the
+        page and lets the write through; restore() then only rewrites the
+        pages that were dirtied, and translated blocks are kept.
+        """
+        self.pristine_ctx = self.emu.context_save()
+        self.pristine_pages = {}
+        self.dirty_pages = {}
+        for begin, end, perms in list(self.emu.mem_regions()):
+            if perms & UC_PROT_WRITE:
+                self.emu.mem_protect(begin, end - begin + 1, perms & ~UC_PROT_WRITE)
+        self.memory.on_map = self.page_mapped
+        self.add_hook(UC_HOOK_MEM_WRITE_PROT, self.dirty_page_hook)
+
+    def restore(self):
+        for page, perms in self.dirty_pages.items():
+            self.emu.mem_write(page, self.pristine_pages[page])
+            self.emu.mem_protect(page, PAGE_SIZE, perms & ~UC_PROT_WRITE)
+        self.dirty_pages.clear()
+        self.emu.context_restore(self.pristine_ctx)
+        self.emu_err = None
 
-    def print_level_text(self):
-        raise NotImplementedError
+    def mark_dirty(self, address: int, size: int) -> bool:
+        for page in range(address & ~(PAGE_SIZE - 1), address + size, PAGE_SIZE):
+            if page in self.dirty_pages:
+                continue
+            perms = self.memory.perms(page)
+            if perms is None or not perms & UC_PROT_WRITE:
+                return False
+            if page not in self.pristine_pages:
+                self.pristine_pages[page] = bytes(self.emu.mem_read(page, PAGE_SIZE))
+            self.emu.mem_protect(page, PAGE_SIZE, perms)
+            self.dirty_pages[page] = perms
+        return True
 
-    def trace(self):
-        raise NotImplementedError
+    def run_trials(self, trials: List[tuple]) -> GradeResult:
+        """
+        Call unit_test_user_code(*args) for each trial, every one starting from
+        the current state, and stop at the first failure, whose result is
+        returned.
+
+        Trials run without the trace recorder; only a failing trial is
+        replayed under it (see replay_trial).
+        """
+        self.snapshot()
+        if self.recorder is not None:
+            self.recorder.uninstall(self)
+
+        failed = result = None
+        if self.TRIAL_WORKERS > 1 and len(trials) > 1:
+            pool = TrialPool(self, self.TRIAL_WORKERS)
+            result = pool.run(trials)
+            failed = pool.failed
+        else:
+            for args in trials:
+                self.restore()
+                if self.metrics is not None:
+                    self.metrics.trials += 1
+                result = self.unit_test_user_code(*args)
+                if not result.won:
+                    failed = args
+                    break
+
+        if failed is None:
+            return result if result is not None and not result.won else GradeResult(self.name, True)
+        self.replay_trial(failed)
+        return result
+
+    @contextlib.contextmanager
+    def replaying(self):
+        """
+        Around a run made beside the graded ones (a trial's replay, the
+        profile, the tiers): the level's errors, time and entry registers
+        are put back as they were however it ends.
+        """
+        saved = (self.emu_err, self.budget_err, self.emu_time, self.entry_regs)
+        try:
+            yield
+        finally:
+            self.emu_err, self.budget_err, self.emu_time, self.entry_regs = saved
+
+    def replay_trial(self, args: tuple):
+        """
+        Run a failed trial again with the trace recorder on, for the record
+        of how it failed.  Trials are deterministic in their arguments; the
+        replay's result is discarded, it gets a fresh TIME_BUDGET of its own
+        and leaves the level's errors as they were.
+        """
+        if self.recorder is None:
+            return
+        with self.replaying():
+            self.emu_time = max(0.0, self.TOTAL_TIME_BUDGET - self.TIME_BUDGET)
+            self.restore()
+            self.recorder.install(self)
+            self.unit_test_user_code(*args)
+
+    def verify_vectors(self, spec: LevelSpec, result: GradeResult) -> GradeResult:
+        """
+        Re-run a passing submission on VERIFY_TRIALS more random inputs and
+        return the first failing trial's result, or `result` itself.
+
+        The level's trial_vectors(np, rng, n) draws every input at once with
+        NumPy and computes every expected output in one vectorized pass.  The
+        trials then share one fresh emulator set up for `spec`, restored from
+        a snapshot, with only the input registers and memory rows written per
+        trial.
+        """
+        if not result.won or not self.VERIFY_TRIALS or getattr(self, "trial_vectors", None) is None:
+            return result
+        import numpy as np
+
+        rng = np.random.default_rng(random.getrandbits(64))
+        vectors = self.trial_vectors(np, rng, self.VERIFY_TRIALS)
+        regs = [(reg, values.tolist()) for reg, values in vectors.regs.items()]
+        mem = [(addr, rows) for addr, rows in vectors.mem.items()]
+        expect = [(reg, values.tolist()) for reg, values in vectors.expect.items()]
 
-    def run(self):
-        #self.print_welcome()
-        self.print_level_text()
+        self.create_emu()
+        self.install(spec)
+        self.snapshot()
+
+        for i in range(vectors.count):
+            self.restore()
+            trial = self.execute(LevelSpec(
+                regs={reg: values[i] for reg, values in regs},
+                mem={addr: rows[i].tobytes() for addr, rows in mem},
+                expect={reg: values[i] for reg, values in expect},
+            ))
+            if not trial.won:
+                if trial.reason is None:
+                    trial.reason = f"Failed randomized trial {i + 1} of {vectors.count}"
+                return trial
+        return result
+
+    def load_harness(self, harness: A64Template):
+        self.harness = harness
+        self.harness_code = harness.assemble()
+        self.write_mem(self.LIB_ADDR, self.harness_code)
+
+    def page_mapped(self, page: int, perms: int):
+        # a page first touched after the snapshot was all zeroes in it
+        if perms & UC_PROT_WRITE:
+            self.pristine_pages.setdefault(page, ZERO_PAGE)
+            self.dirty_pages[page] = perms
+
+    def dirty_page_hook(self, uc, access, address, size, value, user_data):
+        if not self.mark_dirty(address, size):
+            return False
+        # unicorn drops the faulting store even when the hook handles it
+        uc.mem_write(address, (value & ((1 << (8 * size)) - 1)).to_bytes(size, "little"))
+        return True
 
-        self.get_asm_from_user()
+    def write_mem(self, address: int, data: bytes):
+        """
+        mem_write for the grader's own seeding: maps the pages it touches and
+        keeps snapshot bookkeeping.
+        """
+        self.memory.map(address, len(data))
+        if self.pristine_ctx is not None:
+            self.mark_dirty(address, len(data))
+        self.emu.mem_write(address, data)
 
-        self.create_emu()
+    def read_mem(self, address: int, size: int) -> bytearray:
+        self.memory.map(address, size)
+        return self.emu.mem_read(address, size)
 
-        print("Executing your code...")
-        self.print_disasm()
+    def print_level_text(self):
+        raise NotImplementedError
 
-        won = self.trace()
-        if won:
-            self.print_flag()
+    def spec(self) -> LevelSpec:
+        raise NotImplementedError
+
+    def trace(self) -> GradeResult:
+        """
+        Grade the submission against the level's spec(): one checked run, or
+        one per trial from a shared snapshot.  A pass is then profiled on
+        the single run or the first trial.
+        """
+        spec = self.spec()
+        error = spec.length_error(len(self.asm))
+        if error is not None:
+            return self.result(False, reason=error)
+
+        self.install(spec)
+        if spec.trials:
+            self.seed(spec)
+            result = self.run_trials([(trial,) for trial in spec.trials])
+            sample = spec.trials[0]
         else:
-            print("\nSorry, no flag :(.")
+            if self.PROFILE or spec.guards:
+                self.snapshot()
+            result = self.execute(spec)
+            sample = spec
+        if result.won and self.PROFILE:
+            result.profile = self.profile_run(sample)
+        result = self.verify_vectors(spec, result)
+        if result.won and self.TIERS:
+            result.tiers = self.grade_tiers()
+        return result
+
+    def tier_spec(self, size: Optional[int]) -> tuple:
+        """(LevelSpec, driver overhead in instructions) for a tier of the given size."""
+        raise NotImplementedError
 
-        return won
+    def grade_tiers(self) -> List[dict]:
+        """
+        Run TIERS in order, each on a fresh emulator as one emu_start whose
+        count is the tier's instruction bound, and stop at the first tier
+        missed.  Like replay_trial, this leaves the level's errors and time
+        as they were.
+        """
+        tiers = []
+        reached = True
+        with self.replaying():
+            try:
+                for name, max_insns, size in self.TIERS:
+                    if reached:
+                        spec, overhead = self.tier_spec(size)
+                        self.create_emu()
+                        self.install(spec)
+                        self.INSN_BUDGET = max_insns + overhead
+                        self.emu_time = 0.0
+                        reached = self.execute(spec).won
+                    tiers.append({"name": name, "max_insns": max_insns, "reached": reached})
+            finally:
+                self.__dict__.pop("INSN_BUDGET", None)
+        return tiers
+
+    def profile_run(self, spec: LevelSpec) -> dict:
+        """
+        Replay a run of `spec` from the snapshot with an ExecutionProfile
+        attached and return its summary.  Like replay_trial, the replay's
+        outcome is discarded and the level's errors and time are left as
+        they were.
+        """
+        self.profile = ExecutionProfile(self.COST_MODEL)
+        with self.replaying():
+            self.restore()
+            self.seed(spec)
+            begin, until = self.code_range
+            self.profile.install(self, begin)
+            self.emu_stopped = False
+            try:
+                self.emu.emu_start(begin, until, count=self.PROFILE_INSN_BUDGET)
+            except UcError:
+                pass
+            finally:
+                self.profile.uninstall(self)
+            self.profile.complete = self.emu_err is None and (
+                self.emu_stopped or self.emu.reg_read(UC_ARM64_REG_PC) == until
+            )
+        summary = self.profile.summary()
+        if self.metrics is not None:
+            self.metrics.instructions += summary["instructions"]
+            self.metrics.blocks += sum(self.profile.hits.values())
+        return summary
+
+    def check_guards(self, spec: LevelSpec):
+        """
+        Fail the run just made of `spec` if it changed a guarded word.  The
+        run is replayed from the snapshot with MemoryGuards watching, which
+        stops at the offending store and reports its PC and address; only
+        that error is kept from the replay.
+        """
+        address = self.guards.breached()
+        if address is None:
+            return
+        error = None
+        if self.pristine_ctx is not None:
+            with self.replaying():
+                self.restore()
+                self.seed(spec)
+                self.guards.watch()
+                begin, until = self.code_range
+                try:
+                    self.emu.emu_start(begin, until, count=self.INSN_BUDGET)
+                except UcError:
+                    pass
+                finally:
+                    self.guards.unwatch()
+                error = self.emu_err
+        # None when not reproduced, or with nothing to replay from
+        self.emu_err = error or f"fail: out-of-bounds write to {hex(address)}"
+
+    def install(self, spec: LevelSpec):
+        """Load the harness and put in the hooks `spec` needs on a new emulator."""
+        if spec.harness is not None:
+            self.load_harness(spec.harness)
+            self.code_range = (self.LIB_ADDR, self.LIB_ADDR + len(self.harness_code))
+        else:
+            code_addr = self.BASE_ADDR + self.CODE_OFFSET
+            self.code_range = (code_addr, code_addr + len(self.asm))
+        if spec.allow:
+            self.add_emu_inst_filter(spec.allow, True)
+        for htype, callback, begin, end in spec.hooks:
+            self.add_hook(htype, callback, begin=begin, end=end)
+        if spec.blocks is not None:
+            self.add_hook(UC_HOOK_BLOCK, self.visit_block)
+        self.install_guards(spec)
+
+    def install_guards(self, spec: LevelSpec):
+        """Guard spec.guards, replacing whatever an earlier spec guarded."""
+        self.memory.guards = []
+        self.guards = MemoryGuards(spec.guards) if spec.guards else None
+        if self.guards is not None:
+            self.guards.install(self)
+
+    def seed(self, spec: LevelSpec):
+        if spec.regs:
+            self.regs.write(spec.regs)
+        for address, data in spec.images:
+            self.write_mem(address, data)
+
+    def execute(self, spec: LevelSpec) -> GradeResult:
+        """Seed, emulate and check one run of `spec` from the current state."""
+        self.visited = []
+        error = None
+        try:
+            self.seed(spec)
+            if self.guards is not None:
+                self.guards.arm()
+            self.emulate(*self.code_range)
+        except UcError as e:
+            error = e
+        if self.guards is not None and self.emu_err is None:
+            self.check_guards(spec)
 
-    def blacklist_hook(self, uc, address, size, user_data):
-        md = Cs(CS_ARCH_ARM64, CS_MODE_ARM)
-        i = next(md.disasm(uc.mem_read(address, size), address))
+        if self.emu_err:
+            return self.result(False, error=error, reason=self.emu_err)
+
+        regs = self.regs.read()
+        words = {}
+        for where in spec.expect:
+            if isinstance(where, Mem):
+                try:
+                    words[where] = int.from_bytes(self.read_mem(where.locate(regs), 8), "little")
+                except UcError as e:
+                    return self.result(False, error=error or e, reason=f"Could not read {where.label()}")
+
+        matched, expected, actual = spec.compare(regs, words, self.visited)
+        return self.result(
+            error is None and matched,
+            error=error,
+            inputs=spec.inputs,
+            expected=expected,
+            actual=actual,
+        )
 
-        if i.mnemonic in self.filter_list:
-            self.emu_err = "fail: this instruction is not allowed: %s" % i.mnemonic
-            uc.emu_stop()
+    def unit_test_user_code(self, spec: LevelSpec) -> GradeResult:
+        """One of run_trials' trials."""
+        return self.execute(spec)
+
+    def visit_block(self, uc, address, size, user_data):
+        self.visited.append(address)
+
+    def result(self, won: bool, error: Optional[Exception] = None, **details) -> GradeResult:
+        """
+        A GradeResult for this level.  Failures also keep the registers, which
+        is the only work done here beyond storing what the checker passes.
+        """
+        failed = (error is not None or not won) and self.entry_regs is not None
+        return GradeResult(
+            self.name,
+            bool(won),
+            error=None if error is None else str(error),
+            regs=self.regs.read() if failed else None,
+            entry_regs=self.entry_regs if failed else None,
+            **details,
+        )
 
-    def whitelist_hook(self, uc, address, size, user_data):
-        md = Cs(CS_ARCH_ARM64, CS_MODE_ARM)
-        i = next(md.disasm(uc.mem_read(address, size), address))
+    def finish(self, result: GradeResult) -> GradeResult:
+        """Apply the budgets to trace()'s verdict and attach the counters."""
+        if self.budget_err is not None:
+            result.won = False
+            if result.reason is None and result.error != self.budget_err:
+                result.reason = self.budget_err
+        if not result.won and result.reason is None:
+            result.reason = self.emu_err
+        result.counters["emu_seconds"] = self.emu_time
+        if self.metrics is not None:
+            result.counters.update(self.metrics.counters())
+        return result
+
+    def run(self) -> GradeResult:
+        #self.print_welcome()
+        with self.phase("level_text"):
+            self.print_level_text()
+
+        with self.phase("read_input"):
+            self.get_asm_from_user()
+
+        with self.phase("create_emu"):
+            self.create_emu()
+
+        with self.phase("disasm"):
+            print("Executing your code...")
+            self.print_disasm()
+
+        with self.phase("trace"):
+            result = self.finish(self.trace())
+        with self.phase("verdict"):
+            text = result.render()
+            if text:
+                print(text)
+            if result.won:
+                self.print_flag()
+            else:
+                print("\nSorry, no flag :(.")
+                if self.recorder is not None:
+                    self.recorder.print_tail()
+                    self.save_trace()
+
+        if self.metrics is not None:
+            self.metrics.emit(self.METRICS_SINK, result.won, self)
+        return result
+
+    def grade(self) -> GradeResult:
+        """
+        Emulate and check the submission without any of run()'s terminal
+        I/O; render() the result for the transcript.
+        """
+        self.create_emu()
+        return self.finish(self.trace())
 
-        if i.mnemonic not in self.filter_list:
-            self.emu_err = "fail: this instruction is not allowed: %s" % i.mnemonic
-            uc.emu_stop()
+    def save_trace(self) -> Optional[str]:
+        if self.recorder is None or self.TRACE_DIR is None:
+            return None
+        path = os.path.join(self.TRACE_DIR, f"{type(self).__name__}-{os.getpid()}-{time.time_ns()}.trace")
+        with open(path, "wb") as fp:
+            self.recorder.dump(fp)
+        return path
 
     def add_emu_inst_filter(self, insts: List, whitelist: bool):
-        self.filter_list = insts
-        if whitelist:
-            self.emu.hook_add(UC_HOOK_CODE, self.whitelist_hook)
-        else:
-            self.emu.hook_add(UC_HOOK_CODE, self.blacklist_hook)
-
- 
+        code_addr = self.BASE_ADDR + self.CODE_OFFSET
+        self.inst_filter = InstructionFilter(insts, whitelist, code_addr, code_addr + len(self.asm))
+        self.inst_filter.install(self)
 
     def print_flag(self):
         with open(self.FLAG_PATH, "r") as fp:
@@ -169,8 +1913,7 @@ class EmbryoARMBase:
 
     def print_disasm(self):
         print("---------------- CODE ----------------")
-        md = Cs(CS_ARCH_ARM64, CS_MODE_ARM)
-        for i in md.disasm(self.asm, self.BASE_ADDR + self.CODE_OFFSET):
+        for i in get_disassembler().disasm(self.asm, self.BASE_ADDR + self.CODE_OFFSET):
             print("0x%x:\t%-6s\t%s" % (i.address, i.mnemonic, i.op_str))
         print("--------------------------------------")
 
@@ -179,19 +1922,104 @@ class EmbryoARMBase:
             print("Please give me your assembly in bytes (up to 0x1000 bytes): ")
             self.asm = sys.stdin.buffer.read(0x1000)
 
-    def debug_output(self):
-        print(f"PC {hex(self.emu.reg_read(UC_ARM64_REG_PC))}")
-        print(f"SP {hex(self.emu.reg_read(UC_ARM64_REG_SP))}")
-        print(f"LR {hex(self.emu.reg_read(UC_ARM64_REG_LR))}")
-        print(f"X0 {hex(self.emu.reg_read(UC_ARM64_REG_X0))}")
-        print(f"X1 {hex(self.emu.reg_read(UC_ARM64_REG_X1))}")
-        print(f"X2 {hex(self.emu.reg_read(UC_ARM64_REG_X2))}")
-        print(f"X3 {hex(self.emu.reg_read(UC_ARM64_REG_X3))}")
-        print(f"X4 {hex(self.emu.reg_read(UC_ARM64_REG_X4))}")
-        print(f"X5 {hex(self.emu.reg_read(UC_ARM64_REG_X5))}")
-        print(f"X6 {hex(self.emu.reg_read(UC_ARM64_REG_X6))}")
-        print(f"X7 {hex(self.emu.reg_read(UC_ARM64_REG_X7))}")
-        print(f"X8 {hex(self.emu.reg_read(UC_ARM64_REG_X8))}")
+def line_equation_vectors(np, rng, n: int) -> TrialVectors:
+    x0, x1, x2 = rng.integers(1, 10000, size=(3, n), dtype=np.uint64, endpoint=True)
+    return TrialVectors(
+        n,
+        regs={UC_ARM64_REG_X0: x0, UC_ARM64_REG_X1: x1, UC_ARM64_REG_X2: x2},
+        expect={UC_ARM64_REG_X0: x0 * x1 + x2},
+    )
+
+def array_sum_spec(level, data: List[int], max_insns: Optional[int] = None) -> LevelSpec:
+    key = level.key.to_bytes(4, "little")
+    end = level.arr_addr + 8 * len(data)
+    return LevelSpec(
+        regs={UC_ARM64_REG_X0: level.arr_addr, UC_ARM64_REG_X1: len(data)},
+        mem={level.arr_addr - 0x4: key, level.arr_addr: qwords(*data), end: key},
+        max_insns=max_insns,
+        expect={UC_ARM64_REG_X0: sum(data) & U64_MAX},
+        guards=[(level.arr_addr - 0x4, level.arr_addr), (end, end + 0x4)],
+        inputs={"X0": level.arr_addr, "X1": len(data), f"[{hex(level.arr_addr)}:]": data},
+    )
+
+def stack_guards(level) -> List[tuple]:
+    """
+    Guard pages at the floor of the stack region and just above its top:
+    the guest may use as much of the stack as it likes, but not run off
+    either end.
+    """
+    return [(level.BASE_STACK, level.BASE_STACK + PAGE_SIZE), (level.RSP_INIT, level.RSP_INIT + PAGE_SIZE)]
+
+def array_sum_fields() -> List[FuzzField]:
+    return [ArrayField("data", 50, 100, IntField("item", 2 ** 32 - 1000000, 2 ** 32 - 1))]
+
+def array_sum_tier(level, size: int) -> tuple:
+    rng = random.Random(size)
+    return array_sum_spec(level, [rng.randint(2 ** 32 - 1000000, 2 ** 32 - 1) for _ in range(size)]), 0
+
+def tier_call_spec(level, calls: List[tuple], expect: List[int], mem: Optional[dict] = None) -> tuple:
+    """
+    (LevelSpec, overhead) running every call of a function level in one
+    emulation.  A driver at LIB_ADDR walks an argument table at TIER_ADDR,
+    resets SP and zeroes the caller-saved registers the normal harness
+    leaves at zero, calls the submission with x0, x1, ... set from the
+    table, and stores the returned x0 and SP for each call.  The driver's
+    own instructions per call are the overhead.
+    """
+    nargs = len(calls[0])
+    state = level.TIER_ADDR
+    args = state + 0x20
+    results = args + 8 * nargs * len(calls)
+
+    driver = A64Template().mov_imm64(9, state)
+    driver.emit(a64_ldr(10, 9))
+    for reg in range(nargs):
+        driver.emit(a64_ldr(reg, 10, 8 * reg))
+    driver.emit(a64_add_imm(10, 10, 8 * nargs)).emit(a64_str(10, 9))
+    driver.emit(a64_ldr(11, 9, 24)).emit(a64_add_imm(31, 11, 0))
+    for reg in [*range(nargs, 16), 17, 18, 29]:
+        driver.mov(reg, 0)
+    driver.mov_imm64(16, level.BASE_ADDR + level.CODE_OFFSET).blr(16)
+    driver.mov_imm64(9, state)
+    driver.emit(a64_ldr(10, 9, 8)).emit(a64_str(0, 10))
+    driver.emit(a64_add_imm(11, 31, 0)).emit(a64_str(11, 10, 8))
+    driver.emit(a64_add_imm(10, 10, 16)).emit(a64_str(10, 9, 8))
+    driver.emit(a64_ldr(10, 9, 16)).emit(a64_sub_imm(10, 10, 1)).emit(a64_str(10, 9, 16))
+    overhead = len(driver.words) + 1
+    driver.emit(a64_cbnz(10, -4 * len(driver.words)))
+
+    expected = {}
+    for i, value in enumerate(expect):
+        expected[Mem(results + 16 * i)] = value
+        expected[Mem(results + 16 * i + 8)] = level.RSP_INIT
+    spec = LevelSpec(
+        mem={
+            **(mem or {}),
+            state: qwords(args, results, len(calls), level.RSP_INIT),
+            args: qwords(*(arg for call in calls for arg in call)),
+        },
+        harness=driver,
+        expect=expected,
+    )
+    return spec, overhead * len(calls)
+
+def array_sum_vectors(level, np, rng, n: int) -> TrialVectors:
+    data = rng.integers(2 ** 32 - 1000000, 2 ** 32 - 1, size=(n, level.arr_len), dtype=np.uint64, endpoint=True)
+    key = np.frombuffer(struct.pack("<I", level.key), dtype=np.uint8)
+    # the guard key, the array and the trailing guard key as one write per trial
+    rows = np.empty((n, 8 + 8 * level.arr_len), dtype=np.uint8)
+    rows[:, :4] = key
+    rows[:, 4:-4] = data.astype("<u8").view(np.uint8)
+    rows[:, -4:] = key
+    return TrialVectors(
+        n,
+        regs={
+            UC_ARM64_REG_X0: np.full(n, level.arr_addr, dtype=np.uint64),
+            UC_ARM64_REG_X1: np.full(n, level.arr_len, dtype=np.uint64),
+        },
+        mem={level.arr_addr - 0x4: rows},
+        expect={UC_ARM64_REG_X0: data.sum(axis=1, dtype=np.uint64)},
+    )
 
 class EmbryoARMSetRegister(EmbryoARMBase):
     """
@@ -210,16 +2038,8 @@ class EmbryoARMSetRegister(EmbryoARMBase):
         )
         print(f"{self.reg} = {hex(self.value)}\n")
 
-    def trace(self):
-        try:
-            self.emu.emu_start(self.BASE_ADDR, self.BASE_ADDR + len(self.asm))
-        except UcError as e:
-            print("ERROR: %s" % e)
-            self.debug_output()
-            return False
-
-        x1 = self.emu.reg_read(UC_ARM64_REG_X1)
-        return x1 == self.value
+    def spec(self):
+        return LevelSpec(expect={UC_ARM64_REG_X1: self.value})
 
 class EmbryoARMSetLargeRegister(EmbryoARMBase):
     """
@@ -247,16 +2067,8 @@ class EmbryoARMSetLargeRegister(EmbryoARMBase):
         )
         print(f"\t{self.reg} = {hex(self.value)}\n")
 
-    def trace(self):
-        try:
-            self.emu.emu_start(self.BASE_ADDR, self.BASE_ADDR + len(self.asm))
-        except UcError as e:
-            print("ERROR: %s" % e)
-            self.debug_output()
-            return False
-
-        x0_val = self.emu.reg_read(UC_ARM64_REG_X1)
-        return x0_val == self.value
+    def spec(self):
+        return LevelSpec(expect={UC_ARM64_REG_X1: self.value})
 
 class EmbryoARMLineEquation(EmbryoARMBase):
     """
@@ -268,6 +2080,7 @@ class EmbryoARMLineEquation(EmbryoARMBase):
         self.val_x0 = random.randint(1, 10000)
         self.val_x1 = random.randint(1, 10000)
         self.val_x2 = random.randint(1, 10000)
+        self.target = (self.val_x0 * self.val_x1) + self.val_x2
 
     def print_level_text(self):
         print(
@@ -293,20 +2106,14 @@ class EmbryoARMLineEquation(EmbryoARMBase):
             f"\tX2 = {hex(self.val_x2)}\n\n"
         )
 
-    def trace(self):
-        try:
-            self.emu.reg_write(UC_ARM64_REG_X0, self.val_x0)
-            self.emu.reg_write(UC_ARM64_REG_X1, self.val_x1)
-            self.emu.reg_write(UC_ARM64_REG_X2, self.val_x2)
-            self.emu.emu_start(self.BASE_ADDR, self.BASE_ADDR + len(self.asm))
-        except UcError as e:
-            print("ERROR: %s" % e)
-            self.debug_output()
+    def spec(self):
+        return LevelSpec(
+            regs={UC_ARM64_REG_X0: self.val_x0, UC_ARM64_REG_X1: self.val_x1, UC_ARM64_REG_X2: self.val_x2},
+            expect={UC_ARM64_REG_X0: self.target},
+        )
 
-        target = (self.val_x0 * self.val_x1) + self.val_x2
-        print(target)
-        print( self.emu.reg_read(UC_ARM64_REG_X0))
-        return target == self.emu.reg_read(UC_ARM64_REG_X0)
+    def trial_vectors(self, np, rng, n):
+        return line_equation_vectors(np, rng, n)
 
 class EmbryoARMLineEquationSingleInstr(EmbryoARMBase):
     """
@@ -318,6 +2125,7 @@ class EmbryoARMLineEquationSingleInstr(EmbryoARMBase):
         self.val_x0 = random.randint(1, 10000)
         self.val_x1 = random.randint(1, 10000)
         self.val_x2 = random.randint(1, 10000)
+        self.target = (self.val_x0 * self.val_x1) + self.val_x2
 
     def print_level_text(self):
         print(
@@ -341,23 +2149,16 @@ class EmbryoARMLineEquationSingleInstr(EmbryoARMBase):
                 "\t- You may submit only one instruction.\n"
         )
 
-    def trace(self):
-        if  len(self.asm) != 4:
-            print(f"Only submit one aarch64 instruction!  {len(self.asm)} bytes received, but expecting 4!")
-            return False
-        try:
-            self.emu.reg_write(UC_ARM64_REG_X0, self.val_x0)
-            self.emu.reg_write(UC_ARM64_REG_X1, self.val_x1)
-            self.emu.reg_write(UC_ARM64_REG_X2, self.val_x2)
-            self.emu.emu_start(self.BASE_ADDR, self.BASE_ADDR + len(self.asm))
-        except UcError as e:
-            print("ERROR: %s" % e)
-            self.debug_output()
+    def spec(self):
+        return LevelSpec(
+            regs={UC_ARM64_REG_X0: self.val_x0, UC_ARM64_REG_X1: self.val_x1, UC_ARM64_REG_X2: self.val_x2},
+            max_insns=1,
+            exact=True,
+            expect={UC_ARM64_REG_X0: self.target},
+        )
 
-        target = (self.val_x0 * self.val_x1) + self.val_x2
-        print(target)
-        print( self.emu.reg_read(UC_ARM64_REG_X0))
-        return target == self.emu.reg_read(UC_ARM64_REG_X0)
+    def trial_vectors(self, np, rng, n):
+        return line_equation_vectors(np, rng, n)
 
 class EmbryoARMModulo(EmbryoARMBase):
     """
@@ -368,6 +2169,7 @@ class EmbryoARMModulo(EmbryoARMBase):
         super().__init__(asm=asm)
         self.val_x0 = random.randint(1000000, 1000000000)
         self.val_x1 = 2 ** random.randint(1, 10) - 1
+        self.target = self.val_x0 % self.val_x1
 
     def print_level_text(self):
         print(
@@ -390,20 +2192,29 @@ class EmbryoARMModulo(EmbryoARMBase):
               "\t- You may submit 2 instructions.\n"
         )
 
-    def trace(self):
-        if  len(self.asm) > 8:
-            print(f"Maximum of 2 instruction aarch64 instructions!  {len(self.asm)} bytes received, but expecting maximum of 8!")
-            return False
-        try:
-            self.emu.reg_write(UC_ARM64_REG_X0, self.val_x0)
-            self.emu.reg_write(UC_ARM64_REG_X1, self.val_x1)
-            self.emu.emu_start(self.BASE_ADDR, self.BASE_ADDR + len(self.asm))
-        except UcError as e:
-            print("ERROR: %s" % e)
-            self.debug_output()
+    def spec(self):
+        return self.input_spec({"X0": self.val_x0, "X1": self.val_x1})
+
+    def input_spec(self, values: dict) -> LevelSpec:
+        x0, x1 = values["X0"], values["X1"]
+        return LevelSpec(
+            regs={UC_ARM64_REG_X0: x0, UC_ARM64_REG_X1: x1},
+            max_insns=2,
+            # udiv by zero gives zero, so x % 0 is x on aarch64
+            expect={UC_ARM64_REG_X0: x0 % x1 if x1 else x0},
+        )
+
+    def fuzz_fields(self):
+        return [IntField("X0", 1000000, 1000000000), ChoiceField("X1", [2 ** k - 1 for k in range(1, 11)])]
 
-        target = self.val_x0 % self.val_x1
-        return target == self.emu.reg_read(UC_ARM64_REG_X0)
+    def trial_vectors(self, np, rng, n):
+        x0 = rng.integers(1000000, 1000000000, size=n, dtype=np.uint64, endpoint=True)
+        x1 = (np.uint64(1) << rng.integers(1, 10, size=n, dtype=np.uint64, endpoint=True)) - np.uint64(1)
+        return TrialVectors(
+            n,
+            regs={UC_ARM64_REG_X0: x0, UC_ARM64_REG_X1: x1},
+            expect={UC_ARM64_REG_X0: x0 % x1},
+        )
 
 class EmbryoARMBitShift(EmbryoARMBase):
     """
@@ -413,6 +2224,7 @@ class EmbryoARMBitShift(EmbryoARMBase):
     def __init__(self, asm=None):
         super().__init__(asm)
         self.val_x0 = random.randint(0x55AA55AA55AA55AA, 0x99BB99BB99BB99BB)
+        self.target = (self.val_x0 >> 24) & 0xFF
 
     def print_level_text(self):
         print(
@@ -450,24 +2262,26 @@ class EmbryoARMBitShift(EmbryoARMBase):
             f"\tX0 = {hex(self.val_x0)}\n"
         )
 
-    def trace(self):
-        self.add_emu_inst_filter(["lsl", "lsr"], True)
-        try:
-            self.emu.reg_write(UC_ARM64_REG_X0, self.val_x0)
-            self.emu.emu_start(self.BASE_ADDR, self.BASE_ADDR + len(self.asm))
-        except UcError as e:
-            print("ERROR: %s" % e)
-            self.debug_output()
+    def spec(self):
+        return self.input_spec({"X0": self.val_x0})
 
-        if self.emu_err:
-            print(self.emu_err)
-            return False
+    def input_spec(self, values: dict) -> LevelSpec:
+        return LevelSpec(
+            regs={UC_ARM64_REG_X0: values["X0"]},
+            allow=["lsl", "lsr"],
+            expect={UC_ARM64_REG_X0: (values["X0"] >> 24) & 0xFF},
+        )
 
-        target = (self.val_x0 >> 24) & 0xFF
-        print(hex(target))
+    def fuzz_fields(self):
+        return [IntField("X0", 0x55AA55AA55AA55AA, 0x99BB99BB99BB99BB)]
 
-        print(hex(self.emu.reg_read(UC_ARM64_REG_X0)))
-        return target == self.emu.reg_read(UC_ARM64_REG_X0)
+    def trial_vectors(self, np, rng, n):
+        x0 = rng.integers(0x55AA55AA55AA55AA, 0x99BB99BB99BB99BB, size=n, dtype=np.uint64, endpoint=True)
+        return TrialVectors(
+            n,
+            regs={UC_ARM64_REG_X0: x0},
+            expect={UC_ARM64_REG_X0: (x0 >> np.uint64(24)) & np.uint64(0xFF)},
+        )
 
 class EmbryoARMMemoryAccess(EmbryoARMBase):
     """
@@ -478,6 +2292,7 @@ class EmbryoARMMemoryAccess(EmbryoARMBase):
         super().__init__(asm)
         self.val0 = random.randint(1000000, 2000000)
         self.val1 = random.randint(1000000, 2000000)
+        self.target = self.val0 + self.val1
 
         # make this larger so it cannot be a single move
         self.BASE_ADDR = 0x1337_40_00_00_00
@@ -517,28 +2332,16 @@ class EmbryoARMMemoryAccess(EmbryoARMBase):
             f"\t[{hex(self.DATA_ADDR + 8)}] = {hex(self.val1)}\n\n"
         )
 
-    def trace(self):
-        is_correct = False
-        try:
-            self.emu.mem_write(self.DATA_ADDR, struct.pack("<Q", self.val0))
-            self.emu.mem_write(self.DATA_ADDR + 8, struct.pack("<Q", self.val1))
-            self.emu.emu_start(self.BASE_ADDR, self.BASE_ADDR + len(self.asm))
-        except UcError as e:
-            print("ERROR: %s" % e)
-            self.debug_output()
-            return is_correct
-
-        try:
-            target = struct.unpack("<Q", self.emu.mem_read(self.DATA_ADDR + 0x10, 8))[0]
-            is_correct = target == self.val0 + self.val1
-
-            is_correct &= self.val0 == self.emu.reg_read(UC_ARM64_REG_X0)
-            is_correct &= self.val1 == self.emu.reg_read(UC_ARM64_REG_X1)
-        except Exception as e:
-            print("Fail!")
-            return False
-
-        return is_correct
+    def spec(self):
+        return LevelSpec(
+            mem={self.DATA_ADDR: qwords(self.val0, self.val1)},
+            expect={
+                UC_ARM64_REG_X0: self.val0,
+                UC_ARM64_REG_X1: self.val1,
+                Mem(self.DATA_ADDR + 0x10): self.target,
+            },
+            inputs={f"[{hex(self.DATA_ADDR)}]": self.val0, f"[{hex(self.DATA_ADDR + 8)}]": self.val1},
+        )
 
 class EmbryoARMMemoryAccessPairs(EmbryoARMBase):
     """
@@ -571,35 +2374,14 @@ class EmbryoARMMemoryAccessPairs(EmbryoARMBase):
             f"\t[{hex(self.DATA_ADDR + 8)}] = {hex(self.val1)}\n\n"
         )
 
-    def trace(self):
-        self.add_emu_inst_filter(["ldp", "stp", "mov", "movk"], True)
-
-        if len(self.asm) > 16:
-            print(f"Maximum 4 aarch64 instructions allowed!  {len(self.asm)} bytes received, but expecting <=16!")
-            return False
-
-
-        is_correct = False
-        try:
-            self.emu.mem_write(self.DATA_ADDR, struct.pack("<Q", self.val0))
-            self.emu.mem_write(self.DATA_ADDR + 8, struct.pack("<Q", self.val1))
-            self.emu.emu_start(self.BASE_ADDR, self.BASE_ADDR + len(self.asm))
-        except UcError as e:
-            print("ERROR: %s" % e)
-            self.debug_output()
-            return is_correct
-
-        try:
-            res0 = struct.unpack("<Q", self.emu.mem_read(self.DATA_ADDR + 0x10, 8))[0]
-            res1 = struct.unpack("<Q", self.emu.mem_read(self.DATA_ADDR + 0x18, 8))[0]
-            is_correct = res0 == self.val0
-            is_correct &= res1 == self.val1
-
-        except Exception as e:
-            print("Fail!")
-            return False
-
-        return is_correct
+    def spec(self):
+        return LevelSpec(
+            mem={self.DATA_ADDR: qwords(self.val0, self.val1)},
+            max_insns=4,
+            allow=["ldp", "stp", "mov", "movk"],
+            expect={Mem(self.DATA_ADDR + 0x10): self.val0, Mem(self.DATA_ADDR + 0x18): self.val1},
+            inputs={f"[{hex(self.DATA_ADDR)}]": self.val0, f"[{hex(self.DATA_ADDR + 8)}]": self.val1},
+        )
 
 
 class EmbryoARMMemoryAccessArray(EmbryoARMBase):
@@ -615,6 +2397,7 @@ class EmbryoARMMemoryAccessArray(EmbryoARMBase):
             random.randint(2 ** 32 - 1000000, 2 ** 32 - 1) for _ in range(self.arr_len)
         ]
         self.key = random.randint(0xAA55AA55, 0xBB99BB99)
+        self.target = sum(self.data)
 
     def print_level_text(self):
         print(
@@ -635,46 +2418,23 @@ class EmbryoARMMemoryAccessArray(EmbryoARMBase):
             f"\t- X0 = {hex(self.arr_addr)}\n"
             f"\t- X1 = {self.arr_len}\n"
         )
-    def trace(self):
-        try:
-            self.emu.reg_write(UC_ARM64_REG_X0, self.arr_addr)
-            self.emu.reg_write(UC_ARM64_REG_X1, self.arr_len)
+    def spec(self):
+        return self.input_spec({"data": self.data})
 
-            self.emu.mem_write(self.arr_addr - 0x4, struct.pack("<I", self.key))
-            self.emu.mem_write(
-                self.arr_addr, struct.pack(f"<{'q'*self.arr_len}", *self.data)
-            )
-            self.emu.mem_write(
-                self.arr_addr + (self.arr_len * 8), struct.pack("<I", self.key)
-            )
+    def input_spec(self, values: dict) -> LevelSpec:
+        return array_sum_spec(self, values["data"])
 
-            self.emu.emu_start(self.BASE_ADDR, self.BASE_ADDR + len(self.asm))
-        except UcError as e:
-            print("ERROR: %s" % e)
-            print(f"PC: {hex(self.emu.reg_read(UC_ARM64_REG_PC))}")
-
-        target = sum(self.data)
-        correct = target == self.emu.reg_read(UC_ARM64_REG_X0)
-
-        if not correct:
-            print(
-            f"""
-            [!] ------------------------- [!]
-            Failed test check:
-            Input:
-            X0 = {hex(self.arr_addr)}
-            X1 = {self.arr_len}
-            [{hex(self.arr_addr)}: = {[hex(i) for i in self.data]}
-
-            Correct output:
-            X0 = {hex(target)}
-
-            Your output
-            X0 = {hex(self.emu.reg_read(UC_ARM64_REG_X0))}
-            [!] ------------------------- [!]
-            """
-            )
-        return correct
+    def fuzz_fields(self):
+        return array_sum_fields()
+
+    # a 4 instruction post-indexed loop, and ldp pairs
+    TIERS = [("post-indexed", 4 * 1024 + 16, 1024), ("paired", 3 * 1024, 1024)]
+
+    def tier_spec(self, size):
+        return array_sum_tier(self, size)
+
+    def trial_vectors(self, np, rng, n):
+        return array_sum_vectors(self, np, rng, n)
 
 
 class EmbryoARMMemoryAccessArraySixInstr(EmbryoARMBase):
@@ -690,6 +2450,7 @@ class EmbryoARMMemoryAccessArraySixInstr(EmbryoARMBase):
             random.randint(2 ** 32 - 1000000, 2 ** 32 - 1) for _ in range(self.arr_len)
         ]
         self.key = random.randint(0xAA55AA55, 0xBB99BB99)
+        self.target = sum(self.data)
 
     def print_level_text(self):
 
@@ -724,50 +2485,23 @@ class EmbryoARMMemoryAccessArraySixInstr(EmbryoARMBase):
             "\t- Use values where they are.\n"
             "\t- Don't forget to place the result in x0.\n"
         )
-    def trace(self):
-        if len(self.asm) > 24:
-            print(f"Maximum 6 aarch64 instructions allowed!  {len(self.asm)} bytes received, but expecting <=24!")
-            return False
+    def spec(self):
+        return self.input_spec({"data": self.data})
 
-        try:
-            self.emu.reg_write(UC_ARM64_REG_X0, self.arr_addr)
-            self.emu.reg_write(UC_ARM64_REG_X1, self.arr_len)
+    def input_spec(self, values: dict) -> LevelSpec:
+        return array_sum_spec(self, values["data"], max_insns=6)
 
-            self.emu.mem_write(self.arr_addr - 0x4, struct.pack("<I", self.key))
-            self.emu.mem_write(
-                self.arr_addr, struct.pack(f"<{'q'*self.arr_len}", *self.data)
-            )
-            self.emu.mem_write(
-                self.arr_addr + (self.arr_len * 8), struct.pack("<I", self.key)
-            )
+    def fuzz_fields(self):
+        return array_sum_fields()
 
-            self.emu.emu_start(self.BASE_ADDR, self.BASE_ADDR + len(self.asm))
-        except UcError as e:
-            print("ERROR: %s" % e)
-            print(f"PC: {hex(self.emu.reg_read(UC_ARM64_REG_PC))}")
-
-        target = sum(self.data)
-        correct = target == self.emu.reg_read(UC_ARM64_REG_X0)
-
-        if not correct:
-            print(
-            f"""
-            [!] ------------------------- [!]
-            Failed test check:
-            Input:
-            X0 = {hex(self.arr_addr)}
-            X1 = {self.arr_len}
-            [{hex(self.arr_addr)}: = {[hex(i) for i in self.data]}
-
-            Correct output:
-            X0 = {hex(target)}
-
-            Your output
-            X0 = {hex(self.emu.reg_read(UC_ARM64_REG_X0))}
-            [!] ------------------------- [!]
-            """
-            )
-        return correct
+    # six instructions leave no room for pairs and an odd tail
+    TIERS = [("post-indexed", 4 * 1024 + 16, 1024)]
+
+    def tier_spec(self, size):
+        return array_sum_tier(self, size)
+
+    def trial_vectors(self, np, rng, n):
+        return array_sum_vectors(self, np, rng, n)
 
 
 class EmbryoARMPopPush(EmbryoARMBase):
@@ -778,6 +2512,7 @@ class EmbryoARMPopPush(EmbryoARMBase):
     def __init__(self, asm=None, should_debug=False):
         super().__init__(asm)
         self.val_stk = [random.randint(1000000, 1000000000) for _ in range(8)]
+        self.target = sum(self.val_stk) // 8
 
     def print_level_text(self):
         print(
@@ -803,25 +2538,20 @@ class EmbryoARMPopPush(EmbryoARMBase):
 
         print("Please pop 8 QWORDS from the stack, compute their average, and push the result back onto the stack.\n")
 
-    def trace(self):
-        try:
-            print(self.val_stk)
-            self.emu.mem_write(
-                self.BASE_STACK + 0x200000 - 0x48, struct.pack("<QQQQQQQQ", *self.val_stk)
-            )
-            self.emu.reg_write(UC_ARM64_REG_SP, self.BASE_STACK + 0x200000 - 0x48)
-            self.emu.emu_start(self.BASE_ADDR, self.BASE_ADDR + len(self.asm))
-        except UcError as e:
-            print("ERROR: %s" % e)
-            self.debug_output()
+    def spec(self):
+        return LevelSpec(
+            regs={UC_ARM64_REG_SP: self.RSP_INIT - 0x48},
+            mem={self.RSP_INIT - 0x48: qwords(*self.val_stk)},
+            expect={Mem(reg=UC_ARM64_REG_SP): self.target},
+            guards=stack_guards(self),
+            inputs={"stack": self.val_stk},
+        )
 
-        if self.emu_err:
-            print(self.emu_err)
-            return False
+    # ldp pairs and a shift for the division, with or without a spare instruction
+    TIERS = [("paired", 16, None), ("minimal", 13, None)]
 
-        target = bytearray(struct.pack("<Q", (sum(self.val_stk) // 8)))
-        sp = self.emu.reg_read(UC_ARM64_REG_SP)
-        return target == self.emu.mem_read(sp, 8)
+    def tier_spec(self, size):
+        return self.spec(), 0
 
 class EmbryoARMRegSwap(EmbryoARMBase):
     """
@@ -856,26 +2586,21 @@ class EmbryoARMRegSwap(EmbryoARMBase):
                 "HINT: You have already used the necessary instructions in previous levels!"
         )
 
-    def trace(self):
-        if len(self.asm) > 8:
-            print(f"Only submit two aarch64 instruction!  {len(self.asm)} bytes received, but expecting 8!")
-            return False
-
-        try:
-            self.emu.reg_write(UC_ARM64_REG_X0, self.val_x0)
-            self.emu.reg_write(UC_ARM64_REG_X1, self.val_x1)
-            self.emu.emu_start(self.BASE_ADDR, self.BASE_ADDR + len(self.asm))
-        except UcError as e:
-            print("ERROR: %s" % e)
-            self.debug_output()
-
-        if self.emu_err:
-            print(self.emu_err)
-            return False
+    def spec(self):
+        return LevelSpec(
+            regs={UC_ARM64_REG_X0: self.val_x0, UC_ARM64_REG_X1: self.val_x1},
+            max_insns=2,
+            expect={UC_ARM64_REG_X0: self.val_x1, UC_ARM64_REG_X1: self.val_x0},
+            guards=stack_guards(self),
+        )
 
-        correct = self.val_x0 == self.emu.reg_read(UC_ARM64_REG_X1)
-        correct &= self.val_x1 == self.emu.reg_read(UC_ARM64_REG_X0)
-        return correct
+    def trial_vectors(self, np, rng, n):
+        x0, x1 = rng.integers(1000000, 1000000000, size=(2, n), dtype=np.uint64, endpoint=True)
+        return TrialVectors(
+            n,
+            regs={UC_ARM64_REG_X0: x0, UC_ARM64_REG_X1: x1},
+            expect={UC_ARM64_REG_X0: x1, UC_ARM64_REG_X1: x0},
+        )
 
 
 class EmbryoARMJumps(EmbryoARMBase):
@@ -892,22 +2617,14 @@ class EmbryoARMJumps(EmbryoARMBase):
         self.rel_off = 0x40
         self.val = random.randint(0x10, 0x100)
 
-        self.traversed_bbs = []
-
         self.exit_key = random.randint(0, 0xFFFF)
 
-        self.lib = pwnlib.asm.asm(
-            f"""
-            mov x0, #{self.exit_key}
-            mov x8, #0x3c
-            svc #1337
-            """
-        )
+        self.lib = A64Template().mov(0, self.exit_key).mov(8, 0x3C).svc(1337).assemble()
 
     def stop_hook(self, uc, address, size, user_data):
         x8 = uc.reg_read(UC_ARM64_REG_X8)
         if x8 == 0x3C:
-            uc.emu_stop()
+            self.stop_emu(uc)
 
     def print_level_text(self):
         print(
@@ -931,45 +2648,28 @@ class EmbryoARMJumps(EmbryoARMBase):
             f"\t- (stack) [{hex(self.RSP_INIT - 0x8)}] = {hex(self.val)}\n\n"
         )
 
-    def hook_block(self, uc, address, size, user_data):
-        self.traversed_bbs.append(address)
-
-    def trace(self):
-        self.emu.hook_add(
-            UC_HOOK_CODE, self.stop_hook, begin=self.LIB_ADDR + len(self.lib)
-        )
-
-        self.emu.hook_add(UC_HOOK_BLOCK, self.hook_block, begin=self.code_load_addr)
-        try:
-            self.emu.reg_write(UC_ARM64_REG_SP, self.RSP_INIT - 0x10)
-            self.emu.mem_write(self.RSP_INIT - 0x10, struct.pack("<Q", self.val))
-            self.emu.mem_write(self.LIB_ADDR, self.lib)
-            self.emu.emu_start(self.code_load_addr, self.code_load_addr + len(self.asm))
-        except UcError as e:
-            print("ERROR: %s" % e)
-            self.debug_output()
-            return False
-
-        correct_bb_order = [
-            self.code_load_addr,
-            self.code_load_addr + self.rel_off,
-            self.LIB_ADDR,
-        ]
-
-        target = self.exit_key
-
-        return (
-            target == self.emu.reg_read(UC_ARM64_REG_X0)
-            and correct_bb_order == self.traversed_bbs
-            and self.val == self.emu.reg_read(UC_ARM64_REG_X1)
+    def spec(self):
+        # the library's closing svc, which the run stops on instead of taking
+        svc = self.LIB_ADDR + len(self.lib) - 4
+        return LevelSpec(
+            regs={UC_ARM64_REG_SP: self.RSP_INIT - 0x10},
+            mem={self.RSP_INIT - 0x10: qwords(self.val), self.LIB_ADDR: self.lib},
+            hooks=[(UC_HOOK_CODE, self.stop_hook, svc, svc)],
+            expect={UC_ARM64_REG_X0: self.exit_key, UC_ARM64_REG_X1: self.val},
+            blocks=[self.code_load_addr, self.code_load_addr + self.rel_off, self.LIB_ADDR],
+            inputs={},
         )
 
 class EmbryoARMAvg(EmbryoARMBase):
+    TRIALS = 100
+
     def __init__(self, asm=None):
         super().__init__(asm)
         self.avg_count = random.randint(1, 100)
         self.val_stk = [random.randint(1000000, 1000000000) for _ in range(self.avg_count)]
+        self.target = sum(self.val_stk) // self.avg_count
         self.code_load_addr = self.BASE_ADDR + self.CODE_OFFSET
+        self.values_addr = self.BASE_STACK
 
     def print_level_text(self):
         print(
@@ -1013,59 +2713,57 @@ class EmbryoARMAvg(EmbryoARMBase):
             "- count is the number of 64 bit numbers in the array\n"
         )
 
-    def unit_test_user_code(self):
-
-        self.harness = pwnlib.asm.asm(f"""
-                            mov x0, #{hex(self.BASE_STACK & 0xFFFF)}
-                            movk x0, #{hex((self.BASE_STACK & 0xFFFF0000) >> 16)}, lsl 16
-                            movk x0, #{hex((self.BASE_STACK & 0xFFFF00000000) >> 32)}, lsl 32
-                            movk x0, #{hex((self.BASE_STACK & 0xFFFF000000000000) >> 48)}, lsl 48
-                            mov x1, #{hex(self.avg_count)}
-                            mov x3, #{hex(self.code_load_addr & 0xFFFF)}
-                            movk x3, #{hex((self.code_load_addr & 0xFFFF0000) >> 16)}, lsl 16
-                            blr x3
-                            """)
-
-        self.create_emu()
-
-        try:
-            self.emu.mem_write(
-                self.BASE_STACK, struct.pack(f"<{'Q' * self.avg_count}", *self.val_stk)
-            )
-
-            self.emu.mem_write(self.LIB_ADDR, self.harness)
-            self.emu.emu_start(self.LIB_ADDR, self.LIB_ADDR + len(self.harness))
-
-        except UcError as e:
-            print("ERROR: %s" % e)
-            self.debug_output()
-
-        stack_fixed = self.emu.reg_read(UC_ARM64_REG_SP) == self.RSP_INIT
-
-        def avg(arr):
-            return int(sum(i for i in arr)/len(arr))
-
+    def build_harness(self):
+        return (
+            A64Template()
+            .mov_imm64(0, self.values_addr)
+            .mov_imm64(1, self.avg_count)
+            .mov_imm64(3, self.code_load_addr)
+            .blr(3)
+        )
 
-        val_x0 = self.emu.reg_read(UC_ARM64_REG_X0)
-        correct = val_x0 == avg(self.val_stk) and stack_fixed
+    def spec(self):
+        return LevelSpec(
+            mem={self.BASE_STACK: qwords(*self.val_stk)},
+            harness=self.build_harness(),
+            trials=[
+                LevelSpec(
+                    expect={UC_ARM64_REG_X0: self.target, UC_ARM64_REG_SP: self.RSP_INIT},
+                    inputs={"values": self.val_stk},
+                )
+            ] * self.TRIALS,
+        )
 
-        if not correct:
-            print(f"""nope, expected value {hex(avg(self.val_stk))} but got {hex(val_x0)}\n""")
-            # mem = self.emu.mem_read(self.BASE_STACK, 64)
-            # yep = [mem[i:i+8] for i in range(0, 64, 8)]
-            # for i in yep: print(pwnlib.util.packing.u64(i))
-            self.debug_output()
-            print(f"values: {[hex(val) for val in self.val_stk]}")
+    # counts 1, 2, 4, ... up to size over one array; a 4 instruction
+    # post-indexed loop, and ldp pairs
+    TIERS = [("post-indexed", 4 * 8191 + 256, 4096), ("paired", 3 * 8191, 4096)]
+
+    def tier_spec(self, size):
+        rng = random.Random(size)
+        values = [rng.randint(1000000, 1000000000) for _ in range(size)]
+        counts = [2 ** k for k in range(size.bit_length()) if 2 ** k <= size]
+        return tier_call_spec(
+            self,
+            [(self.BASE_STACK, count) for count in counts],
+            [sum(values[:count]) // count for count in counts],
+            mem={self.BASE_STACK: qwords(*values)},
+        )
 
-        return correct
+def fib_table(limit: int) -> List[int]:
+    table = [0, 1]
+    while len(table) <= limit:
+        table.append(table[-1] + table[-2])
+    return table
 
-    def trace(self):
-        for _ in range(100):
-            if not self.unit_test_user_code():
-                return False
-        return True
+# fib(93) is the last value that fits in a 64 bit register
+FIB_TABLE = fib_table(93)
 
 class EmbryoARMFib(EmbryoARMBase):
+    # naive recursion for fib(30) runs a few tens of millions of instructions
+    INSN_BUDGET = 250_000_000
+    TIME_BUDGET = 30.0
+    TOTAL_TIME_BUDGET = 300.0
+
     def __init__(self, asm=None):
         super().__init__(asm)
         self.code_load_addr = self.BASE_ADDR + self.CODE_OFFSET
@@ -1111,58 +2809,268 @@ class EmbryoARMFib(EmbryoARMBase):
             "- pos is position in the fibonacci sequence\n"
         )
 
-    def unit_test_user_code(self, fib_arg):
-
+    def build_harness(self):
         # movk is not needed, but for completeness
-        self.harness = pwnlib.asm.asm(f"""
-                            mov x3, #{hex(self.code_load_addr & 0xFFFF)}
-                            movk x3, #{hex((self.code_load_addr >> 16) & 0xFFFF)}, lsl 16
-                            movk x3, #{hex((self.code_load_addr >> 32) & 0xFFFF)}, lsl 32
-                            movk x3, #{hex((self.code_load_addr >> 48) & 0xFFFF)}, lsl 48
-                            blr x3
-                            """)
+        return A64Template().mov_imm64(3, self.code_load_addr).blr(3)
 
-        self.create_emu()
+    def spec(self):
+        trials = []
+        for _ in range(100):
+            n = random.randint(1, 30)
+            trials.append(LevelSpec(
+                regs={UC_ARM64_REG_X0: n},
+                expect={UC_ARM64_REG_X0: FIB_TABLE[n], UC_ARM64_REG_SP: self.RSP_INIT},
+            ))
+        return LevelSpec(harness=self.build_harness(), trials=trials)
 
-        try:
-            self.emu.reg_write(UC_ARM64_REG_X0, fib_arg)
+    # fib(1) ... fib(size) in one run; naive recursion would need over
+    # 10**19 instructions for fib(90) alone
+    TIERS = [("linear", 50_000, 90), ("tight", 20_000, 90)]
 
-            self.emu.mem_write(self.LIB_ADDR, self.harness)
-            self.emu.emu_start(self.LIB_ADDR, self.LIB_ADDR + len(self.harness))
+    def tier_spec(self, size):
+        return tier_call_spec(self, [(n,) for n in range(1, size + 1)], FIB_TABLE[1:size + 1])
 
-        except UcError as e:
-            print("ERROR: %s" % e)
-            self.debug_output()
+def qword_buffer(np, count: int, offset: int = 0, tail: int = 0) -> tuple:
+    """
+    (mmap, view): anonymous whole pages holding `count` little-endian qwords
+    at byte `offset`, with `tail` more bytes after them, and a NumPy view of
+    the qwords for generating and checking them in place.
+    """
+    import mmap
 
-        stack_fixed = self.emu.reg_read(UC_ARM64_REG_SP) == self.RSP_INIT
+    size = (offset + 8 * count + tail + PAGE_SIZE - 1) & ~(PAGE_SIZE - 1)
+    buffer = mmap.mmap(-1, size)
+    return buffer, np.frombuffer(buffer, dtype="<u8", count=count, offset=offset)
 
-        def fib(n):
-            if n <= 1:
-                return n
-            else:
-                return fib(n - 1) + fib(n - 2)
+class EmbryoARMMemoryAccessArrayLarge(EmbryoARMMemoryAccessArray):
+    """
+    MemoryAccessArray over millions of qwords.  The array lives in an mmap
+    mapped into the guest in place, is generated there by NumPy and summed
+    there for the check.
+    """
 
+    MIN_LEN = 1_000_000
+    MAX_LEN = 2_000_000
+    INSN_BUDGET = 16 * MAX_LEN
 
-        val_x0 = self.emu.reg_read(UC_ARM64_REG_X0)
-        correct = val_x0 == fib(fib_arg) and stack_fixed
+    # no small-array variants of a large level
+    TIERS = []
+    fuzz_fields = None
+    trial_vectors = None
 
-        if not correct:
-            print(f"""nope, expected value {hex(fib(fib_arg))} but got {hex(val_x0)}\n""")
-            self.debug_output()
+    def __init__(self, asm=None, should_debug=False):
+        super().__init__(asm)
+        import numpy as np
+
+        rng = np.random.default_rng(random.getrandbits(64))
+        self.arr_len = random.randint(self.MIN_LEN, self.MAX_LEN)
+        # key, array, key, as in the small level
+        buffer, self.data = qword_buffer(np, self.arr_len, offset=8, tail=4)
+        self.data[:] = rng.integers(2 ** 32 - 1000000, 2 ** 32 - 1, size=self.arr_len, dtype=np.uint64, endpoint=True)
+        key = self.key.to_bytes(4, "little")
+        buffer[4:8] = key
+        buffer[8 + 8 * self.arr_len:12 + 8 * self.arr_len] = key
+        self.arr_addr = self.LARGE_ADDR + 8
+        self.buffers.append((self.LARGE_ADDR, buffer))
+        self.target = int(self.data.sum(dtype=np.uint64))
+
+    def spec(self):
+        end = self.arr_addr + 8 * self.arr_len
+        return LevelSpec(
+            regs={UC_ARM64_REG_X0: self.arr_addr, UC_ARM64_REG_X1: self.arr_len},
+            expect={UC_ARM64_REG_X0: self.target},
+            guards=[(self.arr_addr - 0x4, self.arr_addr), (end, end + 0x4)],
+        )
 
-        return correct
+class EmbryoARMAvgLarge(EmbryoARMAvg):
+    """
+    Avg over millions of qwords, mapped into the guest from an mmap in
+    place of the stack copy and averaged by NumPy for the check.
+    """
 
-    def trace(self):
-        for _ in range(100):
-            fib_arg = random.randint(1, 30)
-            if not self.unit_test_user_code(fib_arg):
-                return False
-        return True
+    MIN_COUNT = 1_000_000
+    MAX_COUNT = 2_000_000
+    INSN_BUDGET = 16 * MAX_COUNT
+    TRIALS = 3
 
-if __name__ == "__main__":
+    TIERS = []
+
+    def __init__(self, asm=None):
+        super().__init__(asm)
+        import numpy as np
+
+        rng = np.random.default_rng(random.getrandbits(64))
+        self.avg_count = random.randint(self.MIN_COUNT, self.MAX_COUNT)
+        buffer, values = qword_buffer(np, self.avg_count)
+        values[:] = rng.integers(1000000, 1000000000, size=self.avg_count, dtype=np.uint64, endpoint=True)
+        self.val_stk = values
+        self.values_addr = self.LARGE_ADDR
+        self.buffers.append((self.LARGE_ADDR, buffer))
+        self.target = int(values.sum(dtype=np.uint64)) // self.avg_count
+
+    def spec(self):
+        return LevelSpec(
+            harness=self.build_harness(),
+            trials=[
+                LevelSpec(
+                    expect={UC_ARM64_REG_X0: self.target, UC_ARM64_REG_SP: self.RSP_INIT},
+                    inputs={"ptr": self.values_addr, "count": self.avg_count},
+                )
+            ] * self.TRIALS,
+        )
+
+def load_level_config() -> int:
+    config = (pathlib.Path(__file__).parent / ".config").read_text()
+    return int(config)
+
+def load_operator_file(name: str, parse):
+    """
+    Apply parse(text) to the operator's settings file `name` next to
+    run.py, if there is one.  run.py runs with the challenge's privileges
+    and whoever invokes it controls its environment, so settings come from
+    these files only, never from environment variables.
+    """
+    path = pathlib.Path(__file__).parent / name
+    if path.exists():
+        parse(path.read_text())
+
+def parse_metrics(text: str):
+    """.metrics: the JSON lines file GradingMetrics records are appended to."""
+    EmbryoARMBase.METRICS_SINK = text.strip() or None
+
+def parse_trace(text: str):
+    """.trace: {"depth": N, "per_insn": bool, "dir": path}, every key optional."""
+    config = json.loads(text or "{}")
+    EmbryoARMBase.TRACE_DEPTH = int(config.get("depth", 4096))
+    EmbryoARMBase.TRACE_INSNS = bool(config.get("per_insn", False))
+    EmbryoARMBase.TRACE_DIR = config.get("dir")
+
+def parse_costs(text: str):
+    """
+    .costs: {"name": ..., "cycles": {mnemonic: N}, "default": N,
+    "taken_branch": N} replaces IN_ORDER_COSTS; {"profile": false} turns
+    profiling off.
+    """
+    config = json.loads(text or "{}")
+    EmbryoARMBase.PROFILE = bool(config.get("profile", True))
+    if "cycles" in config:
+        EmbryoARMBase.COST_MODEL = CostModel(
+            config.get("name", ".costs"),
+            {mnemonic: int(cycles) for mnemonic, cycles in config["cycles"].items()},
+            int(config.get("default", 1)),
+            int(config.get("taken_branch", 0)),
+        )
+
+def parse_tiers(text: str):
+    """
+    .tiers: {"N": [[name, max_insns, size], ...]} replaces level N's TIERS;
+    an empty list turns its tiers off.
+    """
+    config = json.loads(text or "{}")
+    for level, tiers in config.items():
+        globals()[LEVELS[int(level) - 1]].TIERS = [
+            (str(name), int(max_insns), None if size is None else int(size)) for name, max_insns, size in tiers
+        ]
+
+def parse_workers(text: str):
+    """.workers: TRIAL_WORKERS, capped at the number of CPUs."""
+    EmbryoARMBase.TRIAL_WORKERS = max(1, min(int(text), os.cpu_count() or 1))
+
+def parse_verify(text: str):
+    """.verify: VERIFY_TRIALS, the extra randomized trials after a pass."""
+    EmbryoARMBase.VERIFY_TRIALS = max(0, int(text))
+
+OPERATOR_FILES = [
+    (".metrics", parse_metrics),
+    (".trace", parse_trace),
+    (".costs", parse_costs),
+    (".tiers", parse_tiers),
+    (".workers", parse_workers),
+    (".verify", parse_verify),
+]
+
+def load_operator_config():
+    for name, parse in OPERATOR_FILES:
+        load_operator_file(name, parse)
+
+def drop_privileges():
+    os.setuid(os.geteuid())
+
+def run_level(level: int, asm: Optional[bytes] = None) -> bool:
     sel_level = LEVELS[level - 1]
-    level = globals()[sel_level]()
+    return globals()[sel_level](asm=asm).run()
+
+class ForkServer:
+    """
+    AFL-style fork server for the configured level.
+
+    The parent pays for interpreter start-up, imports, config and the setuid
+    drop once, warms up unicorn and capstone, then forks one child per
+    connection on a unix socket.  The child gets the connection as stdin and
+    stdout and runs the level exactly like a cold `run.py` would, so every
+    submission is still graded in its own process.
+
+    Clients send the submission bytes, shut down their write side and read
+    the transcript until EOF.
+    """
+
+    def __init__(self, level: int, path: str):
+        self.level = level
+        self.path = path
+
+    def warm_up(self):
+        get_disassembler()
+        warm = globals()[LEVELS[self.level - 1]](asm=A64Template().mov(0, 0).assemble())
+        warm.create_emu()
+        warm.emu.emu_start(warm.BASE_ADDR, warm.BASE_ADDR + 4)
+
+    def serve_forever(self):
+        self.warm_up()
+        # children are never waited on; let the kernel reap them
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        server.listen(128)
+
+        while True:
+            conn, _ = server.accept()
+            if os.fork() == 0:
+                server.close()
+                self.serve_one(conn)
+            conn.close()
+
+    def serve_one(self, conn: socket.socket):
+        # the parent's SIG_IGN would hide exits of the child's own children
+        # (TrialPool workers) from it
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        # random is reseeded in the child by the interpreter's at-fork hook
+        status = 1
+        try:
+            os.dup2(conn.fileno(), 0)
+            os.dup2(conn.fileno(), 1)
+            os.dup2(conn.fileno(), 2)
+            status = 0 if run_level(self.level) else 1
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            sys.stdout.flush()
+            os._exit(status)
+
+def main(argv: List[str]):
+    level = load_level_config()
+    load_operator_config()
+    drop_privileges()
+
+    if len(argv) == 3 and argv[1] == "--fork-server":
+        ForkServer(level, argv[2]).serve_forever()
+    else:
+        run_level(level)
+
+if __name__ == "__main__":
     try:
-        level.run()
+        main(sys.argv)
     except KeyboardInterrupt:
         sys.exit(1)
@@ -0,0 +1,29 @@
+import pathlib
+import sys
+
+import pytest
+
+HERE = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(HERE))
+# bench/levels.py's solution_source is shared with the tests
+sys.path.insert(0, str(HERE / "bench"))
+
+
+@pytest.fixture(scope="session")
+def assemble():
+    """A64 source to bytes: keystone when it is installed, else asmcache (pwntools and binutils)."""
+    try:
+        from keystone import Ks, KS_ARCH_ARM64, KS_MODE_LITTLE_ENDIAN
+    except ImportError:
+        pass
+    else:
+        ks = Ks(KS_ARCH_ARM64, KS_MODE_LITTLE_ENDIAN)
+        return lambda source: bytes(ks.asm(source)[0])
+
+    from asmcache import asm
+
+    try:
+        asm("nop", arch="aarch64")
+    except Exception as e:
+        pytest.skip(f"no A64 assembler: {e}")
+    return lambda source: asm(source, arch="aarch64")
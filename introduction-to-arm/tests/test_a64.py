@@ -0,0 +1,49 @@
+"""A64Template and the a64_* encoders, checked against capstone and unicorn."""
+
+import random
+import struct
+
+import pytest
+
+import run
+
+from unicorn.arm64_const import UC_ARM64_REG_X0
+
+
+def disasm(word: int, address: int = 0x1000) -> tuple:
+    insn = next(run.get_disassembler().disasm(struct.pack("<I", word), address))
+    return insn.mnemonic, insn.op_str
+
+
+@pytest.mark.parametrize("word, expected", [
+    (run.a64_movz(3, 0x1234), ("mov", "x3, #0x1234")),
+    (run.a64_movz(3, 0x1234, 16), ("mov", "x3, #0x12340000")),
+    (run.a64_movk(30, 0xFFFF, 48), ("movk", "x30, #0xffff, lsl #48")),
+    (run.a64_blr(16), ("blr", "x16")),
+    (run.a64_svc(1337), ("svc", "#0x539")),
+    (run.a64_add_imm(31, 0, 0), ("mov", "sp, x0")),
+    (run.a64_add_imm(1, 31, 0), ("mov", "x1, sp")),
+    (run.a64_add_imm(10, 10, 16), ("add", "x10, x10, #0x10")),
+    (run.a64_sub_imm(10, 10, 1), ("sub", "x10, x10, #1")),
+    (run.a64_cbnz(10, -0x40), ("cbnz", "x10, #0xfc0")),
+    (run.a64_ldr(2, 0, 8 * 31), ("ldr", "x2, [x0, #0xf8]")),
+    (run.a64_str(3, 0), ("str", "x3, [x0]")),
+])
+def test_encoding(word, expected):
+    assert disasm(word) == expected
+
+
+def test_template_assembles_words_in_order():
+    code = run.A64Template().mov(0, 1).emit(run.a64_add_imm(1, 0, 2)).blr(1).svc(0).assemble()
+    assert [disasm(w) for w in struct.unpack("<4I", code)] == [
+        ("mov", "x0, #1"), ("add", "x1, x0, #2"), ("blr", "x1"), ("svc", "#0"),
+    ]
+
+
+@pytest.mark.parametrize("value", [0, 1, 0xFFFF, 0x10000, 0xDEADBEEF, 2 ** 64 - 1, random.Random(3).getrandbits(64)])
+def test_mov_imm64_loads_the_value(value):
+    level = run.EmbryoARMSetRegister(asm=run.A64Template().mov_imm64(0, value).assemble())
+    level.create_emu()
+    level.install(run.LevelSpec())
+    level.emulate(*level.code_range)
+    assert level.emu.reg_read(UC_ARM64_REG_X0) == value
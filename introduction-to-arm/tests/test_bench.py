@@ -0,0 +1,15 @@
+"""bench/levels.py: reference solutions lifted out of levelN/solve.py, graded and timed."""
+
+import pytest
+
+import run
+
+from levels import PHASES, grade_once, solution_source
+
+
+@pytest.mark.parametrize("level", [1, 9, 14], ids=lambda n: run.LEVELS[n - 1])
+def test_grade_once_times_the_reference_solution(level, assemble):
+    won, timings = grade_once(getattr(run, run.LEVELS[level - 1]), assemble(solution_source(level)))
+    assert won
+    assert set(timings) == set(PHASES)
+    assert timings["trace"] >= timings["emulate"] > 0
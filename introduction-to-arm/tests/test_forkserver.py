@@ -0,0 +1,97 @@
+"""ForkServer: one forked child per connection, graded like a cold run.py."""
+
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+import run
+
+from conftest import HERE
+
+
+def submit(path: str, data: bytes) -> bytes:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(path)
+        conn.sendall(data)
+        conn.shutdown(socket.SHUT_WR)
+        chunks = []
+        while True:
+            chunk = conn.recv(65536)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+
+def wait_for_socket(path: str, alive):
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline and alive():
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                probe.connect(path)
+            return
+        except (FileNotFoundError, ConnectionRefusedError):
+            time.sleep(0.02)
+    raise RuntimeError("fork server did not come up")
+
+
+@pytest.fixture
+def level1_server(tmp_path):
+    shutil.copy(HERE / "run.py", tmp_path / "run.py")
+    (tmp_path / ".config").write_text("1")
+    path = str(tmp_path / "grader.sock")
+    server = subprocess.Popen(
+        [sys.executable, str(tmp_path / "run.py"), "--fork-server", path],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_socket(path, lambda: server.poll() is None)
+        yield path
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def test_transcripts(level1_server):
+    wrong = submit(level1_server, run.A64Template().mov(1, 0x1336).assemble())
+    assert b"Executing your code..." in wrong
+    assert b"Sorry, no flag" in wrong
+
+    right = submit(level1_server, run.A64Template().mov(1, 0x1337).assemble())
+    assert b"Executing your code..." in right
+    assert b"Sorry, no flag" not in right
+
+
+def test_connections_are_independent(level1_server):
+    codes = [run.A64Template().mov(1, 0x1337 if i % 2 else i).assemble() for i in range(8)]
+    for i, code in enumerate(codes):
+        assert (b"Sorry, no flag" in submit(level1_server, code)) == (i % 2 == 0)
+
+
+def report_sigchld(level, asm=None):
+    # straight to the connection: pytest has replaced sys.stdout
+    os.write(1, signal.getsignal(signal.SIGCHLD).name.encode())
+
+
+def serve(path: str):
+    run.run_level = report_sigchld
+    run.ForkServer(1, path).serve_forever()
+
+
+def test_children_do_not_inherit_ignored_sigchld(tmp_path):
+    path = str(tmp_path / "grader.sock")
+    server = multiprocessing.get_context("fork").Process(target=serve, args=(path,), daemon=True)
+    server.start()
+    try:
+        wait_for_socket(path, server.is_alive)
+        assert submit(path, b"").strip() == b"SIG_DFL"
+    finally:
+        server.terminate()
+        server.join()
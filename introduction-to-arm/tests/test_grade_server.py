@@ -0,0 +1,54 @@
+"""GradeServer.dispatch: every queued submission is answered, whatever the pool does."""
+
+import asyncio
+import concurrent.futures
+import multiprocessing
+import os
+import signal
+
+import grade_server
+
+
+class FailingPool(concurrent.futures.Executor):
+    def submit(self, fn, *args, **kwargs):
+        raise RuntimeError("no workers")
+
+
+def crash(level, asm):
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+async def dispatch_all(server: grade_server.GradeServer, count: int) -> list:
+    server.queue = grade_server.FairQueue(count, count)
+    dispatcher = asyncio.create_task(server.dispatch())
+    items = [grade_server.Submission("tag:test", 1, b"") for _ in range(count)]
+    for item in items:
+        await server.queue.put(item, 1.0)
+    results = await asyncio.wait_for(asyncio.gather(*(item.done for item in items)), 30)
+    assert not dispatcher.done()
+    dispatcher.cancel()
+    return results
+
+
+def new_server() -> grade_server.GradeServer:
+    return grade_server.GradeServer("unused", 1, 4, 4, 1.0, 8, 1.0, False)
+
+
+def test_pool_errors_are_answered():
+    server = new_server()
+    server.pool = FailingPool()
+    results = asyncio.run(dispatch_all(server, 2))
+    assert [r["reason"] for r in results] == ["grader error: RuntimeError: no workers"] * 2
+    assert server.stats.counts["failed"] == 2
+
+
+def test_broken_pool_is_replaced(monkeypatch):
+    monkeypatch.setattr(grade_server, "grade", crash)
+    server = new_server()
+    server.pool = broken = concurrent.futures.ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("fork"))
+    try:
+        results = asyncio.run(dispatch_all(server, 1))
+        assert results[0]["reason"] == "grader crashed"
+        assert server.pool is not broken
+    finally:
+        server.pool.shutdown(cancel_futures=True)
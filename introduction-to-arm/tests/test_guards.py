@@ -0,0 +1,68 @@
+"""MemoryGuards: out-of-bounds accesses fail the run with their address and PC."""
+
+import pytest
+
+import run
+
+from levels import solution_source
+
+
+def grade(name: str, code: bytes) -> tuple:
+    level = getattr(run, name)(asm=code)
+    return level, level.grade()
+
+
+def code_addr(level: run.EmbryoARMBase, index: int) -> int:
+    return level.BASE_ADDR + level.CODE_OFFSET + 4 * index
+
+
+def test_key_word_below_an_array(assemble):
+    level, result = grade("EmbryoARMMemoryAccessArray", assemble("str w5, [x0, #-4]\n" + solution_source(11)))
+    assert not result.won
+    assert result.reason == f"fail: out-of-bounds write to {hex(level.arr_addr - 4)} at pc {hex(code_addr(level, 0))}"
+
+
+def test_wide_store_reaching_the_end_key(assemble):
+    # stp of 16 bytes starting inside the last element, over the end key
+    source = "add x9, x0, x1, lsl #3\nsub x9, x9, #4\nstp x5, x5, [x9]\nmov x0, #0"
+    level, result = grade("EmbryoARMMemoryAccessArray", assemble(source))
+    end = level.arr_addr + 8 * len(level.data)
+    assert result.reason == f"fail: out-of-bounds write to {hex(end)} at pc {hex(code_addr(level, 2))}"
+
+
+def test_stack_below_the_frame_is_usable(assemble):
+    _, result = grade("EmbryoARMPopPush", assemble("mov x6, #7\nstr x6, [sp, #-0x100]\n" + solution_source(9)))
+    assert result.won, result.render()
+
+
+def test_swap_through_a_stack_pair(assemble):
+    _, result = grade("EmbryoARMRegSwap", assemble("stp x0, x1, [sp, #-32]!\nldp x1, x0, [sp], #32"))
+    assert result.won, result.render()
+
+
+@pytest.mark.parametrize("insn, access", [("str x0, [x5]", "write to"), ("ldr x0, [x5]", "read of")])
+def test_guard_page(assemble, insn, access):
+    source = f"mov x5, #0x7fff\nlsl x5, x5, #32\nmovk x5, #0xff00, lsl #16\n{insn}"
+    level, result = grade("EmbryoARMPopPush", assemble(source))
+    assert level.BASE_STACK == 0x7FFFFF000000
+    assert result.reason == f"fail: out-of-bounds {access} {hex(level.BASE_STACK)} at pc {hex(code_addr(level, 3))}"
+
+
+def test_page_above_the_stack(assemble):
+    level, result = grade("EmbryoARMPopPush", assemble("ldr x0, [sp, #0x48]"))
+    assert result.reason == f"fail: out-of-bounds read of {hex(level.RSP_INIT)} at pc {hex(code_addr(level, 0))}"
+
+
+def test_store_of_the_same_value_is_not_reported(assemble):
+    source = "ldr w5, [x0, #-4]\nstr w5, [x0, #-4]\n" + solution_source(11)
+    _, result = grade("EmbryoARMMemoryAccessArray", assemble(source))
+    assert result.won, result.render()
+
+
+def test_guards_follow_the_installed_spec():
+    level = run.EmbryoARMSetRegister(asm=b"\x1f\x20\x03\xd5")
+    level.create_emu()
+    level.install(run.LevelSpec(guards=[(level.BASE_STACK, level.BASE_STACK + 2 * run.PAGE_SIZE)]))
+    assert level.memory.guards == [(level.BASE_STACK, level.BASE_STACK + 2 * run.PAGE_SIZE)]
+    level.install_guards(run.LevelSpec())
+    assert level.guards is None and level.memory.guards == []
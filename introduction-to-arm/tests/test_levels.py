@@ -0,0 +1,32 @@
+"""Every level's LevelSpec, graded against the reference solution in levelN/solve.py."""
+
+import struct
+
+import pytest
+
+import run
+
+from levels import solution_source
+
+
+def grade(level: int, code: bytes) -> run.GradeResult:
+    instance = getattr(run, run.LEVELS[level - 1])(asm=code)
+    return instance.grade()
+
+
+@pytest.mark.parametrize("level", range(1, len(run.LEVELS) + 1), ids=lambda n: run.LEVELS[n - 1])
+def test_reference_solution_passes(level, assemble):
+    result = grade(level, assemble(solution_source(level)))
+    assert result.won, result.render()
+
+
+@pytest.mark.parametrize("level", range(1, len(run.LEVELS) + 1), ids=lambda n: run.LEVELS[n - 1])
+def test_nop_fails(level):
+    assert not grade(level, struct.pack("<I", 0xD503201F)).won
+
+
+def test_jumps_spin_ends_on_the_budget():
+    # b . never reaches the library's svc the stop hook waits on
+    result = grade(run.LEVELS.index("EmbryoARMJumps") + 1, struct.pack("<I", 0x14000000))
+    assert not result.won
+    assert result.error == f"exceeded budget after {run.EmbryoARMJumps.INSN_BUDGET} instructions"
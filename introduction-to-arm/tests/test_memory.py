@@ -0,0 +1,28 @@
+"""GuestMemory: pages are mapped on demand, up to every page the level reserves."""
+
+import struct
+
+import run
+
+# store into each of the 0x180 pages (1.5 MiB) below sp, then mov x1, #0x1337
+STACK_WALK = [
+    0xD14603E2,  # sub x2, sp, #0x180, lsl #12
+    0xD2803003,  # mov x3, #0x180
+    0xF9000043,  # loop: str x3, [x2]
+    0x91400442,  # add x2, x2, #1, lsl #12
+    0xF1000463,  # subs x3, x3, #1
+    0x54FFFFA1,  # b.ne loop
+    0xD28266E1,  # mov x1, #0x1337
+]
+
+
+def test_limit_covers_the_reservations():
+    level = run.EmbryoARMSetRegister(asm=b"")
+    assert level.MAX_GUEST_PAGES * run.PAGE_SIZE >= level.CODE_SIZE + level.STACK_SIZE
+
+
+def test_deep_stack_use_is_not_a_budget_failure():
+    level = run.EmbryoARMSetRegister(asm=struct.pack(f"<{len(STACK_WALK)}I", *STACK_WALK))
+    result = level.grade()
+    assert result.won, result.render()
+    assert level.memory.resident() > 0x180 * run.PAGE_SIZE
@@ -0,0 +1,38 @@
+"""RegisterFile: the direct batch calls and the public fallbacks agree."""
+
+import array
+
+import pytest
+
+import run
+
+from unicorn import Uc, UC_ARCH_ARM64, UC_MODE_ARM
+from unicorn.arm64_const import *
+
+
+class PublicOnly:
+    """A binding with neither the private handle nor the batch calls."""
+
+    def __init__(self, uc):
+        self.reg_read = uc.reg_read
+        self.reg_write = uc.reg_write
+
+
+@pytest.mark.parametrize("wrap", [lambda uc: uc, PublicOnly], ids=["batch", "public"])
+def test_read_write(wrap):
+    uc = Uc(UC_ARCH_ARM64, UC_MODE_ARM)
+    regs = run.RegisterFile(wrap(uc))
+    assert (regs._batch is not None) == (wrap is not PublicOnly)
+
+    values = {reg: 0x1111111111111111 * (i % 15 + 1) for i, reg in enumerate(run.RegisterFile.XREGS)}
+    values[UC_ARM64_REG_SP] = 0x7FFFFF200000
+    regs.write(values)
+    for reg, value in values.items():
+        assert uc.reg_read(reg) == value
+
+    snapshot = regs.read()
+    assert [snapshot[reg] for reg in values] == list(values.values())
+
+    buf = array.array("Q", bytes(8 * (len(regs.regs) + 2)))
+    regs.read_into(buf, 2)
+    assert buf[2:].tolist() == snapshot.values.tolist()
@@ -0,0 +1,81 @@
+"""TraceRecorder: dump() and load() round-trip what was recorded."""
+
+import io
+import struct
+
+import pytest
+
+import run
+
+from unicorn import UC_HOOK_BLOCK, UC_HOOK_CODE
+
+# mov x0, #0; 1: add x0, x0, #1; add x1, x1, x0; cmp x0, #10; b.ne 1b; mov x2, x1
+LOOP = struct.pack("<6I", 0xD2800000, 0x91000400, 0x8B000021, 0xF100281F, 0x54FFFFA1, 0xAA0103E2)
+
+
+def traced(capacity: int, per_insn: bool) -> tuple:
+    """Run LOOP under a recorder and, alongside it, a hook keeping every record in full."""
+    level = run.EmbryoARMSetRegister(asm=LOOP)
+    level.create_emu()
+    level.install(run.LevelSpec())
+    recorder = run.TraceRecorder(capacity, per_insn)
+    recorder.install(level)
+
+    expected = []
+
+    def full(uc, address, size, user_data):
+        expected.append((address, tuple(uc.reg_read(reg) for reg in run.TraceRecorder.REGS)))
+
+    level.emu.hook_add(UC_HOOK_CODE if per_insn else UC_HOOK_BLOCK, full)
+    level.emu.ctl_flush_tb()
+    level.emulate(*level.code_range)
+    return recorder, expected
+
+
+def round_trip(recorder: run.TraceRecorder) -> list:
+    fp = io.BytesIO()
+    recorder.dump(fp)
+    fp.seek(0)
+    return list(run.TraceRecorder.load(fp))
+
+
+@pytest.mark.parametrize("per_insn", [True, False], ids=["insns", "blocks"])
+def test_round_trip(per_insn):
+    recorder, expected = traced(4096, per_insn)
+    assert recorder.total == len(expected) == (42 if per_insn else 11)
+    assert round_trip(recorder) == expected
+
+
+@pytest.mark.parametrize("capacity", [1, 5, 7])
+def test_wrapped_ring_keeps_the_newest_records(capacity):
+    recorder, expected = traced(capacity, True)
+    assert len(recorder) == capacity
+    # the oldest kept record is written in full, so it loads without the dropped ones
+    assert round_trip(recorder) == expected[-capacity:]
+
+    fp = io.BytesIO()
+    recorder.dump(fp)
+    header = run.TraceRecorder.HEADER.unpack(fp.getvalue()[:run.TraceRecorder.HEADER.size])
+    assert header[3:] == (capacity, len(expected) - capacity)
+
+
+def test_only_changed_registers_are_written():
+    recorder, expected = traced(4096, True)
+    fp = io.BytesIO()
+    recorder.dump(fp)
+    changed = sum(
+        sum(a != b for a, b in zip(previous[1], current[1]))
+        for previous, current in zip(expected, expected[1:])
+    )
+    size = run.TraceRecorder.HEADER.size + len(expected) * run.TraceRecorder.RECORD.size
+    assert len(fp.getvalue()) == size + 8 * (len(run.TraceRecorder.REGS) + changed)
+
+
+def test_load_rejects_other_files():
+    recorder, _ = traced(16, True)
+    fp = io.BytesIO()
+    recorder.dump(fp)
+    data = bytearray(fp.getvalue())
+    data[4:6] = struct.pack("<H", run.TraceRecorder.VERSION + 1)
+    with pytest.raises(ValueError):
+        list(run.TraceRecorder.load(io.BytesIO(bytes(data))))
@@ -0,0 +1,85 @@
+"""TrialPool: trials graded in forked workers report what the in-process loop would."""
+
+import random
+import struct
+import time
+
+import pytest
+
+import run
+
+# fib(n) by iteration: x1, x2 = fib(i), fib(i + 1) until x0 counts down to 0
+FIB = [
+    0xD2800001,  # mov x1, #0
+    0xD2800022,  # mov x2, #1
+    0xB40000C0,  # loop: cbz x0, done
+    0x8B020023,  # add x3, x1, x2
+    0xAA0203E1,  # mov x1, x2
+    0xAA0303E2,  # mov x2, x3
+    0xD1000400,  # sub x0, x0, #1
+    0x17FFFFFB,  # b loop
+    0xAA0103E0,  # done: mov x0, x1
+    0xD65F03C0,  # ret
+]
+# the same, but 0 for every n >= 20
+FIB_BELOW_20 = [
+    0xF100501F,  # cmp x0, #20
+    0x54000063,  # b.lo fib
+    0xD2800000,  # mov x0, #0
+    0xD65F03C0,  # ret
+    *FIB,
+]
+
+
+class SleepyLevel:
+    """What TrialPool uses of a level: trial (seconds, passes) sleeps, then passes or fails."""
+
+    name = "SleepyLevel"
+    metrics = None
+    budget_err = None
+    TIME_BUDGET = 5.0
+    TOTAL_TIME_BUDGET = 30.0
+
+    def restore(self):
+        pass
+
+    def unit_test_user_code(self, seconds, passes):
+        time.sleep(seconds)
+        return run.GradeResult(self.name, passes, reason=f"slept {seconds} with {self.TIME_BUDGET}s")
+
+
+def test_lowest_failing_trial_is_reported():
+    # trial 1 fails at once while trial 0 is still sleeping
+    pool = run.TrialPool(SleepyLevel(), 2)
+    trials = [(0.5, False), (0.0, False), (0.0, True)]
+    result = pool.run(trials)
+    assert pool.failed == trials[0]
+    assert result.reason == "slept 0.5 with 10.0s"
+
+
+def test_every_trial_passing():
+    pool = run.TrialPool(SleepyLevel(), 3)
+    assert pool.run([(0.0, True)] * 8) is None
+    assert pool.failed is None
+
+
+def test_time_budget_is_capped_by_the_total():
+    pool = run.TrialPool(SleepyLevel(), 8)
+    result = pool.run([(0.0, False), (0.0, True)])
+    assert result.reason == "slept 0.0 with 30.0s"
+
+
+def grade_fib(words: list, workers: int, monkeypatch) -> run.GradeResult:
+    monkeypatch.setattr(run.EmbryoARMBase, "TRIAL_WORKERS", workers)
+    random.seed(1)
+    return run.EmbryoARMFib(asm=struct.pack(f"<{len(words)}I", *words)).grade()
+
+
+@pytest.mark.parametrize("workers", [2, 4])
+def test_pool_grades_like_the_loop(workers, monkeypatch):
+    assert grade_fib(FIB, workers, monkeypatch).won
+
+    serial = grade_fib(FIB_BELOW_20, 1, monkeypatch)
+    pooled = grade_fib(FIB_BELOW_20, workers, monkeypatch)
+    assert not serial.won and not pooled.won
+    assert (pooled.inputs, pooled.expected, pooled.actual) == (serial.inputs, serial.expected, serial.actual)